@@ -1,8 +1,7 @@
-import io
 import numpy as np
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import Aer
-import matplotlib.pyplot as plt
+import bb84_core as core
+from rng_streams import make_rng, stream
+from packed_result import PackedResult
 
 def setup_parameters(params):
     defaults = {
@@ -18,127 +17,94 @@ def setup_parameters(params):
     merged = {**defaults, **params}
     return merged
 
-def photon_survives(fiberLength, fiberLoss, sourceEfficiency, detectorEfficiency):
-    total_loss_dB = fiberLength * fiberLoss
-    prob_transmission = sourceEfficiency * 10 ** (-total_loss_dB / 10) * detectorEfficiency
-    return np.random.rand() < prob_transmission
-
-def apply_perturbation(qc, q, perturbProbability):
-    if np.random.rand() < perturbProbability:
-        theta = np.random.uniform(0, np.pi)
-        qc.ry(theta, q)
-
-def prepare_qubit(bit, basis):
-    qc = QuantumCircuit(1, 1)
-    if basis == 0:
-        if bit == 1:
-            qc.x(0)
-    else:
-        if bit == 1:
-            qc.x(0)
-        qc.h(0)
-    return qc
-
-def transmit(qc, params):
+def channels(params):
     # params giữ nguyên tên do frontend gửi
-    if not photon_survives(params['fiberLength'], params['fiberLoss'], params['sourceEfficiency'], params['detectorEfficiency']):
-        return None
-    apply_perturbation(qc, 0, params['perturbProbability'])
-    return qc
-
-def measure_qubit(qc, basis):
-    if basis == 1:
-        qc.h(0)
-    qc.measure(0, 0)
-    simulator = Aer.get_backend('aer_simulator')
-    compiled = transpile(qc, simulator)
-    job = simulator.run(compiled, shots=1, memory=True)
-    res = job.result().get_memory()[0]
-    return int(res)
-
-def calculate_qber(alice_bits, bob_bits, alice_bases, bob_bases):
-    matching = [(a, b) for a, b, ab, bb in zip(alice_bits, bob_bits, alice_bases, bob_bases) if ab == bb and b is not None]
-    if not matching:
-        return 0
-    errors = sum(1 for a, b in matching if a != b)
-    return errors / len(matching)
-
-def bb84_no_Eve(n_bits=1000, params=None):
-    raw_params = setup_parameters(params or {})
-
-    alice_bits = np.random.randint(0, 2, n_bits)
-    alice_bases = np.random.randint(0, 2, n_bits)
-    bob_bases = np.random.randint(0, 2, n_bits)
-
-    raw_key = []
-    bob_bits = []
-    matching_count = 0
-    eve_bits = [None] * n_bits
-    eve_bases = [None] * n_bits
-
-    for bit, a_basis, b_basis in zip(alice_bits, alice_bases, bob_bases):
-        qc = prepare_qubit(bit, a_basis)
-        qc_channel = transmit(qc, raw_params)
-        if qc_channel is None:
-            bob_bits.append(None)
-            raw_key.append((a_basis, b_basis, bit, None))
-            continue
-        result = measure_qubit(qc_channel, b_basis)
-        bob_bits.append(result)
-        raw_key.append((a_basis, b_basis, bit, result))
-        if a_basis == b_basis:
-            matching_count += 1
+    return [
+        core.FiberLoss(params['fiberLength'], params['fiberLoss'],
+                       params['sourceEfficiency'], params['detectorEfficiency']),
+        core.Perturbation(params['perturbProbability']),
+    ]
+
+# Kích thước chunk mặc định. Mọi entry point chia n_bits theo chunk với luồng RNG con
+# rng_streams.stream(seed), nên cùng seed (và chunk_size) cho cùng một lần chạy dù gọi qua
+# bb84_no_Eve/bb84_Eve, bb84_packed hay bb84_stream.
+STREAM_CHUNK = 1_000_000
+
+def _simulate_chunk(n_bits, raw_params, eve, rng, engine='numpy'):
+    # Eve chặn mọi photon đến được chỗ mình, photon gửi lại đi qua kênh thêm một lần
+    chs = channels(raw_params)
+    return core.simulate(n_bits, chs, core.InterceptResend(1.0, chs) if eve else None, engine, rng)
+
+def _chunks(n_bits, raw_params, eve, seed, engine='numpy', chunk_size=STREAM_CHUNK):
+    # (offset, Run) cho từng chunk
+    for offset, rng in zip(range(0, n_bits, chunk_size), stream(seed)):
+        yield offset, _simulate_chunk(min(chunk_size, n_bits - offset), raw_params, eve, rng, engine)
+
+def _simulate(n_bits, raw_params, eve, seed, engine='numpy', chunk_size=STREAM_CHUNK):
+    # Cả lần chạy trong bộ nhớ: các chunk của _chunks nối lại
+    runs = [run for _, run in _chunks(n_bits, raw_params, eve, seed, engine, chunk_size)]
+    if not runs:
+        return _simulate_chunk(0, raw_params, eve, make_rng(seed), engine)
+    if len(runs) == 1:
+        return runs[0]
+    return core.Run(*(None if fields[0] is None else np.concatenate(fields) for fields in zip(*runs)))
+
+def _result_lists(run):
+    n_bits = len(run.alice_bits)
+    if run.eve_bases is not None:
+        eve_bits = np.where(run.eve_detected, run.eve_bits, None).tolist()
+        eve_bases = run.eve_bases.tolist()
+    else:
+        eve_bits = [None] * n_bits
+        eve_bases = [None] * n_bits
 
-    sifted_key = [str(bit) for a, b, bit, res in raw_key if res is not None and a == b and bit == res]
-    qber = calculate_qber(alice_bits, bob_bits, alice_bases, bob_bases)
+    matching, correct = core.sift(run)
+    matching_count = int(np.count_nonzero(matching))
+    sifted_key = run.alice_bits[correct].astype(str).tolist()
+    qber = (matching_count - len(sifted_key)) / matching_count if matching_count else 0
 
     return (
-        alice_bits.tolist(), bob_bits, alice_bases.tolist(), bob_bases.tolist(),
+        run.alice_bits.tolist(), core.bob_bits_list(run), run.alice_bases.tolist(), run.bob_bases.tolist(),
         eve_bits, eve_bases, sifted_key, qber, matching_count
     )
 
-def bb84_Eve(n_bits=1000, params=None):
-    raw_params = setup_parameters(params or {})
-
-    alice_bits = np.random.randint(0, 2, n_bits)
-    alice_bases = np.random.randint(0, 2, n_bits)
-    eve_bases = np.random.randint(0, 2, n_bits)
-    bob_bases = np.random.randint(0, 2, n_bits)
-
-    raw_key = []
-    bob_bits = []
-    eve_bits = []
-    matching_count = 0
-
-    for bit, a_basis, e_basis, b_basis in zip(alice_bits, alice_bases, eve_bases, bob_bases):
-        # Alice -> Eve
-        qc_A = prepare_qubit(bit, a_basis)
-        qc_A_e = transmit(qc_A, raw_params)
-        if qc_A_e is None:
-            bob_bits.append(None)
-            eve_bits.append(None)
-            raw_key.append((a_basis, b_basis, bit, None))
-            continue
-        e_res = measure_qubit(qc_A_e, e_basis)
-        eve_bits.append(e_res)
+def bb84_packed(n_bits=1000, params=None, eve=False, seed=None):
+    # Như bb84_no_Eve/bb84_Eve (engine numpy) nhưng trả về PackedResult thay cho list
+    run = _simulate(n_bits, setup_parameters(params or {}), eve, seed)
+    return PackedResult.from_arrays(run.alice_bits, run.alice_bases, run.bob_bases, run.bob_bits, run.detected,
+                                    run.eve_bits, run.eve_bases, run.eve_detected)
 
-        # Eve -> Bob
-        qc_E = prepare_qubit(e_res, e_basis)
-        qc_E_b = transmit(qc_E, raw_params)
-        if qc_E_b is None:
-            bob_bits.append(None)
-            raw_key.append((a_basis, b_basis, bit, None))
-            continue
-        b_res = measure_qubit(qc_E_b, b_basis)
-        bob_bits.append(b_res)
-        raw_key.append((a_basis, b_basis, bit, b_res))
-        if a_basis == b_basis:
-            matching_count += 1
-
-    sifted_key = [str(bit) for a, b, bit, res in raw_key if res is not None and a == b and bit == res]
-    qber = calculate_qber(alice_bits, bob_bits, alice_bases, bob_bases)
-
-    return (
-        alice_bits.tolist(), bob_bits, alice_bases.tolist(), bob_bases.tolist(),
-        eve_bits, eve_bases.tolist(), sifted_key, qber, matching_count
-    )
+def bb84_stream(n_bits, params=None, eve=False, chunk_size=STREAM_CHUNK, seed=None):
+    # Mô phỏng theo từng chunk cố định, bộ nhớ không phụ thuộc n_bits. Mỗi chunk yield
+    # đoạn khoá sift (uint8, chỉ các bit Bob đo đúng) cùng các bộ đếm cộng dồn.
+    # Mỗi chunk có luồng RNG con riêng nên cùng seed và chunk_size cho kết quả giống hệt.
+    raw_params = setup_parameters(params or {})
+    detections = matches = errors = 0
+    for offset, run in _chunks(n_bits, raw_params, eve, seed, chunk_size=chunk_size):
+        n = len(run.alice_bits)
+        _, correct = core.sift(run)
+        chunk_detections, chunk_matches, chunk_errors = core.counts(run)
+
+        detections += chunk_detections
+        matches += chunk_matches
+        errors += chunk_errors
+        yield {
+            'offset': offset,
+            'size': n,
+            'sifted_key': run.alice_bits[correct].astype(np.uint8),
+            'detections': detections,
+            'matches': matches,
+            'errors': errors,
+            'qber': errors / matches if matches else 0,
+        }
+
+# seed: None, số nguyên, SeedSequence hoặc numpy.random.Generator (xem rng_streams)
+# engine: 'numpy' (vector hoá), 'statevector' hoặc 'aer' (từng mạch Qiskit, chậm),
+# 'aer_batched' (Aer với mạch mẫu có tham số, một lần run cho cả khối)
+def bb84_no_Eve(n_bits=1000, params=None, engine='numpy', seed=None):
+    run = _simulate(n_bits, setup_parameters(params or {}), False, seed, engine)
+    return _result_lists(run)
+
+def bb84_Eve(n_bits=1000, params=None, engine='numpy', seed=None):
+    run = _simulate(n_bits, setup_parameters(params or {}), True, seed, engine)
+    return _result_lists(run)
@@ -0,0 +1,7 @@
+# Lõi mô phỏng BB84 dùng chung cho bb84.py, run_it.py, bb84_simulation.py và bb84_fso.py:
+# kênh truyền, Eve và backend (numpy / statevector / aer / aer_batched) đều thay được.
+from bb84_core.backends import AerBackend, AerBatchedBackend, NumpyBackend, StatevectorBackend, get_backend
+from bb84_core.channels import Channel, FiberLoss, FSOLoss, Perturbation, SOPDeviation
+from bb84_core.eavesdroppers import InterceptResend
+from bb84_core.protocol import (Run, bob_bits_list, calculate_qber_sample, counts, measure, sift, simulate,
+                                transmit)
@@ -0,0 +1,182 @@
+from itertools import product
+
+import numpy as np
+
+import qiskit_cache
+from bb84_core import kernel
+
+# Backend mô phỏng trạng thái cho cả khối photon:
+#   prepare(bits, bases) -> states     rotate(states, angles) -> states (RY theo từng photon)
+#   measure(states, bases, rng) -> bit (int64)     select(mask, a, b) -> a nếu mask, ngược lại b
+# Trạng thái là gì tuỳ backend (mảng biên độ, list QuantumCircuit, bộ (bit, basis, góc)...).
+
+
+class NumpyBackend:
+    # Chạy trên engine vector hoá của bb84_core.kernel: mỗi photon là cặp biên độ thực
+    # (mảng (2, N)), Alice chuẩn bị bằng GateSequence X? -> H?, kênh thêm một cột RY.
+    name = 'numpy'
+
+    def prepare(self, bits, bases):
+        return kernel.run(kernel.GateSequence(len(bits)).prepare(bits, bases))
+
+    def rotate(self, states, angles):
+        return kernel.apply(states, np.full(states.shape[1], kernel.GATE_RY, dtype=np.int8), angles)
+
+    def measure(self, states, bases, rng):
+        return kernel.measure_states(states, bases, rng)
+
+    def select(self, mask, a, b):
+        return np.where(mask, a, b)
+
+
+class _CircuitBackend:
+    # Mỗi photon là một QuantumCircuit 1 qubit (đường tham chiếu, chậm)
+    def prepare(self, bits, bases):
+        from bb84_core.circuits import prepare_qubit
+        return [prepare_qubit(bit, basis) for bit, basis in zip(bits, bases)]
+
+    def rotate(self, states, angles):
+        for qc, theta in zip(states, angles):
+            if theta != 0:
+                qc.ry(float(theta), 0)
+        return states
+
+    def select(self, mask, a, b):
+        return [x if m else y for m, x, y in zip(mask, a, b)]
+
+
+class StatevectorBackend(_CircuitBackend):
+    name = 'statevector'
+
+    def measure(self, states, bases, rng):
+        from qiskit.quantum_info import Statevector
+        p0 = np.empty(len(states))
+        for i, (qc, basis) in enumerate(zip(states, bases)):
+            sv = Statevector.from_instruction(qc)
+            if basis == 1:
+                sv = sv.evolve(qiskit_cache.operator('H'))
+            p0[i] = sv.probabilities()[0]
+        return (rng.random(len(states)) >= p0).astype(np.int64)
+
+
+class AerBackend(_CircuitBackend):
+    # Mỗi photon đo 1 shot trên aer_simulator; cả khối chạy trong một job
+    name = 'aer'
+
+    def measure(self, states, bases, rng):
+        circuits = []
+        for qc, basis in zip(states, bases):
+            qc = qc.copy()
+            if basis == 1:
+                qc.h(0)
+            qc.measure(0, 0)
+            circuits.append(qc)
+        if not circuits:
+            return np.zeros(0, dtype=np.int64)
+        simulator = qiskit_cache.get_backend('aer_simulator')
+        # Seed của Aer lấy từ rng để cả đường Aer cũng chạy lại được
+        compiled = [qiskit_cache.transpile(qc, simulator) for qc in circuits]
+        result = simulator.run(compiled, shots=1, memory=True,
+                               seed_simulator=int(rng.integers(2**31))).result()
+        return np.array([int(result.get_memory(i)[0]) for i in range(len(circuits))], dtype=np.int64)
+
+
+# Số qubit tối đa mỗi mạch khi gộp (giới hạn coupling map của aer_simulator khi transpile)
+AER_PACK_WIDTH = 63
+
+
+def _aer_templates(width):
+    # 8 mạch mẫu theo (bit Alice, basis Alice, basis đo), mỗi mạch width qubit giống nhau:
+    # X? -> H? -> RY(theta_i) -> H? -> đo. Chỉ transpile một lần cho mỗi width (qiskit_cache).
+    # Các qubit không vướng víu nên matrix_product_state chạy tuyến tính theo width.
+    simulator = qiskit_cache.get_backend('aer_simulator', method='matrix_product_state')
+    return qiskit_cache.cached(('aer_templates', width), lambda: _build_aer_templates(simulator, width))
+
+
+def _build_aer_templates(simulator, width):
+    from qiskit import QuantumCircuit, transpile
+    from qiskit.circuit import ParameterVector
+    theta = ParameterVector('theta', width)
+    templates = []
+    for bit, basis, measure_basis in product((0, 1), repeat=3):
+        qc = QuantumCircuit(width, width)
+        qubits = range(width)
+        if bit == 1:
+            qc.x(qubits)
+        if basis == 1:
+            qc.h(qubits)
+        for i in qubits:
+            qc.ry(theta[i], i)
+        if measure_basis == 1:
+            qc.h(qubits)
+        qc.measure(qubits, qubits)
+        templates.append(qc)
+    return simulator, transpile(templates, simulator), theta
+
+
+class AerBatchedBackend:
+    # Aer với mạch mẫu có tham số: trạng thái photon là (bit, basis, tổng góc RY) vì các cổng
+    # RY của kênh cộng dồn được. Khi đo, photon được nhóm theo mạch mẫu, mỗi mạch chứa width
+    # photon (width = 1: một photon mỗi thí nghiệm), góc RY đưa vào qua parameter_binds và cả
+    # khối chạy trong một lần simulator.run. Eve đo rồi gửi lại nên có hai lần run.
+    name = 'aer_batched'
+
+    def __init__(self, width=AER_PACK_WIDTH):
+        self.width = width
+
+    def prepare(self, bits, bases):
+        bits = np.asarray(bits, dtype=np.int64)
+        return bits, np.asarray(bases, dtype=np.int64), np.zeros(len(bits))
+
+    def rotate(self, states, angles):
+        bits, bases, theta = states
+        return bits, bases, theta + angles
+
+    def select(self, mask, a, b):
+        return tuple(np.where(mask, x, y) for x, y in zip(a, b))
+
+    def measure(self, states, bases, rng):
+        bits, prep_bases, theta = states
+        n = len(bits)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        width = self.width
+        simulator, templates, params = _aer_templates(width)
+        template_index = bits * 4 + prep_bases * 2 + np.asarray(bases)
+
+        circuits, binds, members = [], [], []
+        for k, template in enumerate(templates):
+            idx = np.flatnonzero(template_index == k)
+            if len(idx) == 0:
+                continue
+            # photon thừa ở thí nghiệm cuối có góc 0 và bị bỏ khi đọc kết quả
+            angles = np.zeros(-(-len(idx) // width) * width)
+            angles[:len(idx)] = theta[idx]
+            angles = angles.reshape(-1, width)
+            circuits.append(template)
+            binds.append({params[i]: angles[:, i].tolist() for i in range(width)})
+            members.append(idx)
+
+        result = simulator.run(circuits, parameter_binds=binds, shots=1, memory=True, max_parallel_experiments=0,
+                               seed_simulator=int(rng.integers(2**31))).result()
+        # mỗi thí nghiệm một shot, chuỗi hex với clbit i ở bit thứ i
+        shots = np.array([int(r.data.memory[0], 16) for r in result.results], dtype=np.uint64)
+        out = np.empty(n, dtype=np.int64)
+        shift = np.arange(width, dtype=np.uint64)
+        pos = 0
+        for idx in members:
+            rows = -(-len(idx) // width)
+            out[idx] = ((shots[pos:pos + rows, None] >> shift) & np.uint64(1)).ravel()[:len(idx)]
+            pos += rows
+        return out
+
+
+BACKENDS = {b.name: b for b in (NumpyBackend, StatevectorBackend, AerBackend, AerBatchedBackend)}
+
+
+def get_backend(backend):
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown engine: {backend}")
+        return BACKENDS[backend]()
+    return backend
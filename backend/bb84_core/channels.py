@@ -0,0 +1,67 @@
+import numpy as np
+
+# Mô hình kênh truyền dùng chung cho mọi simulator. Mỗi kênh tác động lên một khối n photon:
+#   survival(n, rng): mask photon đi qua (None nếu kênh không gây mất mát)
+#   angles(n, rng):   góc RY áp lên từng photon (None nếu kênh không làm quay trạng thái)
+# Mọi trạng thái trong BB84 đều thực nên nhiễu phân cực được mô hình bằng cổng RY.
+
+
+class Channel:
+    def survival(self, n, rng):
+        return None
+
+    def angles(self, n, rng):
+        return None
+
+
+class FiberLoss(Channel):
+    def __init__(self, fiber_length, fiber_loss, source_efficiency=1.0, detector_efficiency=1.0):
+        self.fiber_length = float(fiber_length)
+        self.fiber_loss = float(fiber_loss)
+        self.source_efficiency = float(source_efficiency)
+        self.detector_efficiency = float(detector_efficiency)
+
+    @property
+    def transmittance(self):
+        total_loss_dB = self.fiber_length * self.fiber_loss
+        return self.source_efficiency * 10 ** (-total_loss_dB / 10) * self.detector_efficiency
+
+    def survival(self, n, rng):
+        return rng.random(n) < self.transmittance
+
+
+class FSOLoss(Channel):
+    # fading: hệ số fading cho từng photon (mảng dài n) hoặc một số cho cả khối;
+    # k: hệ số suy hao khí quyển (dB/m), L: độ dài đường truyền (m)
+    def __init__(self, fading, k, detector_efficiency, L):
+        self.fading = fading
+        self.k = k
+        self.detector_efficiency = detector_efficiency
+        self.L = L
+
+    def transmittance(self):
+        tA = 10 ** (-0.1 * self.k * self.L)
+        return np.minimum(tA * np.asarray(self.fading) * self.detector_efficiency, 1)
+
+    def survival(self, n, rng):
+        return rng.random(n) < self.transmittance()
+
+
+class Perturbation(Channel):
+    # Với xác suất probability, photon bị quay một góc đều trong [0, pi)
+    def __init__(self, probability):
+        self.probability = probability
+
+    def angles(self, n, rng):
+        thetas = rng.uniform(0, np.pi, n)
+        thetas[rng.random(n) >= self.probability] = 0.0
+        return thetas
+
+
+class SOPDeviation(Channel):
+    # Lệch trạng thái phân cực (SOP) theo phân phối chuẩn N(0, sigma)
+    def __init__(self, sigma):
+        self.sigma = sigma
+
+    def angles(self, n, rng):
+        return rng.normal(0, self.sigma, n)
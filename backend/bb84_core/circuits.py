@@ -0,0 +1,81 @@
+import numpy as np
+
+import qiskit_cache
+from bb84_core import kernel
+from rng_streams import make_rng
+
+# Các hàm từng qubit trên QuantumCircuit (đường tham chiếu Qiskit). Qiskit chỉ được import
+# khi gọi để các simulator dùng backend numpy không phải tải nó.
+
+
+def prepare_qubit(bit, basis):
+    from qiskit import QuantumCircuit
+    qc = QuantumCircuit(1, 1)
+    if basis == 0:
+        if bit == 1:
+            qc.x(0)
+    else:
+        if bit == 1:
+            qc.x(0)
+        qc.h(0)
+    return qc
+
+
+def remove_measurements(qc):
+    from qiskit import QuantumCircuit
+    qc2 = QuantumCircuit(qc.num_qubits, qc.num_clbits)
+    for instr in qc.data:
+        if instr.operation.name != 'measure':
+            qc2.append(instr.operation, instr.qubits, instr.clbits)
+    return qc2
+
+
+def photon_survives(transmittance, rng=None):
+    return make_rng(rng).random() < transmittance
+
+
+def apply_perturbation(qc, q, probability, rng=None):
+    rng = make_rng(rng)
+    if rng.random() < probability:
+        theta = rng.uniform(0, np.pi)
+        qc.ry(theta, q)
+
+
+def apply_sop_deviation(qc, q, sigma, rng=None):
+    theta = make_rng(rng).normal(0, sigma)
+    qc.ry(theta, q)
+
+
+def eavesdrop(qc, rng=None):
+    # Eve đo theo basis ngẫu nhiên rồi để lại trạng thái ứng với kết quả đo trong mạch
+    from qiskit.quantum_info import Statevector
+    rng = make_rng(rng)
+    eavesdrop_basis = rng.integers(0, 2)
+    if eavesdrop_basis == 1:
+        qc.h(0)
+    qc.measure(0, 0)
+    sv = Statevector.from_instruction(qc.remove_final_measurements(inplace=False))
+    probs = sv.probabilities_dict()
+    measurement_result = int(rng.random() > probs.get('0', 0))
+    if eavesdrop_basis == 1:
+        if measurement_result == 1:
+            qc.x(0)
+        qc.h(0)
+    return qc
+
+
+def measure_qubit(qc, basis, rng=None):
+    if basis == 1:
+        qc.h(0)
+    qc.measure(0, 0)
+    simulator = qiskit_cache.get_backend('aer_simulator')
+    compiled = qiskit_cache.transpile(qc, simulator)
+    # Seed của Aer lấy từ rng để cả đường Aer cũng chạy lại được
+    job = simulator.run(compiled, shots=1, memory=True, seed_simulator=int(make_rng(rng).integers(2**31)))
+    res = job.result().get_memory()[0]
+    return int(res)
+
+
+def measure_qubit_fast(qc, basis, rng=None):
+    # Như measure_qubit nhưng tính bằng bb84_core.kernel thay vì Aer
+    return int(kernel.measure(kernel.GateSequence.from_circuit(qc), [basis], rng)[0])
@@ -0,0 +1,20 @@
+import numpy as np
+
+# Mô hình Eve. intercept() nhận trạng thái của cả khối photon sau kênh Alice -> Eve và trả về
+# (trạng thái gửi tiếp cho Bob, mask photon bị chặn, basis của Eve, kết quả đo của Eve).
+
+
+class InterceptResend:
+    # Eve chặn một phần photon: chọn basis ngẫu nhiên, đo, rồi gửi lại trạng thái chuẩn bị
+    # theo kết quả đo của mình. Photon gửi lại đi qua resend_channels (đoạn Eve -> Bob);
+    # photon không bị chặn đi qua nguyên vẹn.
+    def __init__(self, fraction=1.0, resend_channels=()):
+        self.fraction = fraction
+        self.resend_channels = tuple(resend_channels)
+
+    def intercept(self, backend, states, n, rng):
+        intercepted = rng.random(n) < self.fraction if self.fraction < 1 else np.ones(n, dtype=bool)
+        eve_bases = rng.integers(0, 2, n)
+        eve_bits = backend.measure(states, eve_bases, rng)
+        resent = backend.prepare(eve_bits, eve_bases)
+        return backend.select(intercepted, resent, states), intercepted, eve_bases, eve_bits
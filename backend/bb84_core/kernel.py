@@ -0,0 +1,125 @@
+import numpy as np
+from rng_streams import make_rng
+
+# Engine vector hoá cho mạch 1 qubit, dùng bởi NumpyBackend và measure_qubit_fast.
+# Mọi cổng đều thực nên trạng thái của N qubit là mảng (2, N) số thực (hàng = biên độ |0>, |1>).
+GATE_I = 0
+GATE_X = 1
+GATE_H = 2
+GATE_RY = 3
+
+GATE_CODES = {'id': GATE_I, 'x': GATE_X, 'h': GATE_H, 'ry': GATE_RY}
+
+_SQRT1_2 = 1 / np.sqrt(2)
+
+# Phần tử ma trận (hàng m00, m01, m10, m11) của các cổng cố định, cột theo mã cổng
+# (I, X, H, RY); RY được điền từ góc trong gate_matrices
+_MATRICES = np.array([[1.0, 0.0, _SQRT1_2, 0.0],
+                      [0.0, 1.0, _SQRT1_2, 0.0],
+                      [0.0, 1.0, _SQRT1_2, 0.0],
+                      [1.0, 0.0, -_SQRT1_2, 0.0]])
+
+class GateSequence:
+    # Danh sách (cổng, góc) cho N qubit, lưu theo cột: mỗi lần append thêm một
+    # cột gồm mã cổng (int8) và góc (float64) cho toàn bộ N qubit.
+    def __init__(self, n):
+        self.n = n
+        self.gates = []
+        self.angles = []
+
+    def append(self, gate, mask=None, angles=None):
+        codes = np.full(self.n, gate, dtype=np.int8)
+        if mask is not None:
+            codes[~np.asarray(mask, dtype=bool)] = GATE_I
+        thetas = np.zeros(self.n) if angles is None else np.broadcast_to(angles, (self.n,)).astype(float)
+        self.gates.append(codes)
+        self.angles.append(thetas)
+        return self
+
+    def prepare(self, bits, bases):
+        # giống prepare_qubit: X nếu bit = 1, sau đó H nếu basis = 1
+        self.append(GATE_X, np.asarray(bits) == 1)
+        self.append(GATE_H, np.asarray(bases) == 1)
+        return self
+
+    def as_arrays(self):
+        if not self.gates:
+            return np.zeros((self.n, 0), dtype=np.int8), np.zeros((self.n, 0))
+        return np.stack(self.gates, axis=1), np.stack(self.angles, axis=1)
+
+    @classmethod
+    def from_circuit(cls, qc):
+        # Bỏ qua phép đo giống remove_measurements
+        seq = cls(1)
+        for instr in qc.data:
+            name = instr.operation.name
+            if name == 'measure' or name == 'barrier':
+                continue
+            if name not in GATE_CODES:
+                raise ValueError(f"Unsupported gate: {name}")
+            angle = float(instr.operation.params[0]) if name == 'ry' else 0.0
+            seq.append(GATE_CODES[name], angles=angle)
+        return seq
+
+
+def gate_matrices(gates, angles):
+    # Trả về 4 phần tử (m00, m01, m10, m11) của ma trận 2x2 cho từng qubit
+    ry = gates == GATE_RY
+    if ry.all():
+        # cột toàn RY (kênh quay mọi photon): không cần tra bảng
+        c = np.cos(angles / 2)
+        s = np.sin(angles / 2)
+        return c, -s, s, c
+    m00, m01, m10, m11 = np.take(_MATRICES, gates, axis=1)
+    if ry.any():
+        c = np.cos(angles[ry] / 2)
+        s = np.sin(angles[ry] / 2)
+        m00[ry] = m11[ry] = c
+        m01[ry] = -s
+        m10[ry] = s
+    return m00, m01, m10, m11
+
+
+def apply(states, gates, angles):
+    # Một cột cổng: nhân ma trận 2x2 cho cả N qubit một lúc
+    m00, m01, m10, m11 = gate_matrices(gates, angles)
+    a, b = states
+    return np.stack([m00 * a + m01 * b, m10 * a + m11 * b])
+
+
+def evolve(states, gates, angles):
+    # gates, angles: các cột cổng và góc theo thứ tự (như GateSequence.gates/angles)
+    for column, thetas in zip(gates, angles):
+        if not column.any():
+            continue
+        states = apply(states, column, thetas)
+    return states
+
+
+def initial_states(n):
+    states = np.zeros((2, n))
+    states[0] = 1.0
+    return states
+
+
+def run(seq, states=None):
+    if states is None:
+        states = initial_states(seq.n)
+    return evolve(states, seq.gates, seq.angles)
+
+
+def prob_zero(seq):
+    return run(seq)[0] ** 2
+
+
+def measure_states(states, bases, rng=None):
+    # Đo theo basis (H nếu basis = 1) rồi lấy mẫu theo P(0)
+    hadamard = np.asarray(bases) == 1
+    a, b = states
+    p0 = np.where(hadamard, (a + b) ** 2 / 2, a ** 2)
+    rand = make_rng(rng).random(len(a))
+    return (rand >= p0).astype(np.int64)
+
+
+def measure(seq, bases, rng=None):
+    return measure_states(run(seq), bases, rng)
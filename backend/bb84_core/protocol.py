@@ -0,0 +1,86 @@
+from collections import namedtuple
+
+import numpy as np
+
+from bb84_core.backends import get_backend
+from rng_streams import make_rng
+
+# Kết quả một lần chạy, toàn bộ là mảng numpy dài n_bits. bob_bits chỉ có nghĩa khi
+# detected; eve_* là None nếu không có Eve, eve_bits chỉ có nghĩa khi eve_detected.
+Run = namedtuple('Run', ['alice_bits', 'alice_bases', 'bob_bases', 'bob_bits', 'detected',
+                         'eve_bases', 'eve_bits', 'eve_detected'])
+
+
+def transmit(backend, states, channels, n, rng, apply=None):
+    # Cho khối photon đi qua lần lượt các kênh; apply (mask) giới hạn các photon chịu tác động
+    detected = np.ones(n, dtype=bool)
+    for channel in channels:
+        survived = channel.survival(n, rng)
+        if survived is not None:
+            detected &= survived if apply is None else survived | ~apply
+        angles = channel.angles(n, rng)
+        if angles is not None:
+            states = backend.rotate(states, angles if apply is None else np.where(apply, angles, 0.0))
+    return states, detected
+
+
+def measure(alice_bits, alice_bases, bob_bases, channels=(), eve=None, backend='numpy', rng=None):
+    # Alice chuẩn bị -> channels -> (Eve chặn, gửi lại qua eve.resend_channels) -> Bob đo
+    backend = get_backend(backend)
+    rng = make_rng(rng)
+    n_bits = len(alice_bits)
+
+    states, detected = transmit(backend, backend.prepare(alice_bits, alice_bases), channels, n_bits, rng)
+    eve_bases = eve_bits = eve_detected = None
+    if eve is not None:
+        states, intercepted, eve_bases, eve_bits = eve.intercept(backend, states, n_bits, rng)
+        eve_detected = detected & intercepted
+        states, survived = transmit(backend, states, eve.resend_channels, n_bits, rng, apply=intercepted)
+        detected = detected & survived
+    bob_bits = backend.measure(states, bob_bases, rng)
+    return Run(np.asarray(alice_bits), np.asarray(alice_bases), np.asarray(bob_bases), bob_bits, detected,
+               eve_bases, eve_bits, eve_detected)
+
+
+def simulate(n_bits, channels=(), eve=None, backend='numpy', rng=None):
+    # Bit và basis ngẫu nhiên cho Alice và Bob rồi chạy measure()
+    rng = make_rng(rng)
+    alice_bits = rng.integers(0, 2, n_bits)
+    alice_bases = rng.integers(0, 2, n_bits)
+    bob_bases = rng.integers(0, 2, n_bits)
+    return measure(alice_bits, alice_bases, bob_bases, channels, eve, backend, rng)
+
+
+def sift(run):
+    # (mask cùng basis và Bob đo được, mask trong đó bit của Bob đúng)
+    matching = run.detected & (run.alice_bases == run.bob_bases)
+    return matching, matching & (run.alice_bits == run.bob_bits)
+
+
+def counts(run):
+    matching, correct = sift(run)
+    matches = int(np.count_nonzero(matching))
+    errors = matches - int(np.count_nonzero(correct))
+    return int(np.count_nonzero(run.detected)), matches, errors
+
+
+def calculate_qber_sample(alice_bits, bob_bits, alice_bases, bob_bases, sample_fraction=0.1, rng=None):
+    # QBER trên một mẫu ngẫu nhiên các photon cùng basis mà Bob đo được (bob_bits là None nếu mất)
+    alice_bits = np.asarray(alice_bits)
+    bob_bits = np.asarray(bob_bits)
+    detected = np.not_equal(bob_bits, None)
+    matching_indices = np.flatnonzero((np.asarray(alice_bases) == np.asarray(bob_bases)) & detected)
+
+    if len(matching_indices) == 0:
+        return 0
+
+    sample_size = max(1, int(len(matching_indices) * sample_fraction))  # ít nhất 1 bit
+    sample_indices = make_rng(rng).choice(matching_indices, sample_size, replace=False)
+
+    num_errors = int(np.count_nonzero(alice_bits[sample_indices] != bob_bits[sample_indices]))
+    return num_errors / sample_size
+
+
+def bob_bits_list(run):
+    # Dạng list cũ: None cho photon bị mất
+    return np.where(run.detected, run.bob_bits, None).tolist()
@@ -1,141 +1,140 @@
 import numpy as np
 import time
-from qiskit import QuantumCircuit
-from qiskit.quantum_info import Statevector
-from qiskit.quantum_info import Operator
-import pandas as pd
-import matplotlib.pyplot as plt
-def photon_survives(loss, fiber_length, fiber_loss, detector_efficiency, source_efficiency):
+import bb84_core as core
+from bb84_core import circuits
+from bb84_core.circuits import prepare_qubit, remove_measurements, measure_qubit_fast
+from bb84_core.protocol import calculate_qber_sample
+from rng_streams import make_rng, spawn, stream
+# Mô hình kênh và engine nằm trong bb84_core, module này chỉ đổi tham số của frontend sang đó.
+# engine mặc định 'numpy' chạy cả khối photon trên bb84_core.kernel; 'statevector'/'aer' và
+# các hàm từng qubit (Qiskit) giữ lại làm đường tham chiếu.
+def fiber_loss(param):
+    return core.FiberLoss(param["fiberLength"], param["fiberLoss"], param["sourceEfficiency"],
+                          param["detectorEfficiency"])
+
+def noise_channels(perturbation_enable, sop_deviation_enable, param):
+    chs = []
+    if perturbation_enable:
+        chs.append(core.Perturbation(param["perturbProb"]))
+    if sop_deviation_enable:
+        chs.append(core.SOPDeviation(param["sopDeviation"]))
+    return chs
+
+def eavesdropper(eavesdrop_enable, param):
+    # Photon Eve gửi lại không đi qua kênh thêm lần nào
+    return core.InterceptResend(param.get("interceptFraction", 1.0)) if eavesdrop_enable else None
+
+def photon_survives(loss, fiber_length, fiber_loss, detector_efficiency, source_efficiency, rng=None):
     if loss:
-        total_loss_dB = fiber_length * fiber_loss
-        prob_transmission = source_efficiency * 10**(-total_loss_dB/10) * detector_efficiency
-        return np.random.rand() < prob_transmission
+        channel = core.FiberLoss(fiber_length, fiber_loss, source_efficiency, detector_efficiency)
+        return circuits.photon_survives(channel.transmittance, rng)
     else:
         return True
 
-def apply_perturbation(qc, q, perturbation, perturb_probability):
+def apply_perturbation(qc, q, perturbation, perturb_probability, rng=None):
     if perturbation:
-        if np.random.rand() < perturb_probability:
-            theta = np.random.uniform(0, np.pi)
-            qc.ry(theta, q)
+        circuits.apply_perturbation(qc, q, perturb_probability, rng)
 
-def apply_sop_deviation(qc, q, sop_deviation, sigma_sop):
+def apply_sop_deviation(qc, q, sop_deviation, sigma_sop, rng=None):
     if sop_deviation:
-        theta = np.random.normal(0, sigma_sop)
-        qc.ry(theta, q)
+        circuits.apply_sop_deviation(qc, q, sigma_sop, rng)
 
-def eavesdrop(qc, eavesdrop_enable):
+def eavesdrop(qc, eavesdrop_enable, rng=None):
     if eavesdrop_enable:
-        eavesdrop_basis = np.random.randint(0, 2)
-        if eavesdrop_basis == 1:
-            qc.h(0)
-        qc.measure(0, 0)
-        # Mô phỏng đo Eve
-        sv = Statevector.from_instruction(qc.remove_final_measurements(inplace=False))
-        probs = sv.probabilities_dict()
-        measurement_result = int(np.random.rand() > probs.get('0', 0))
-        if eavesdrop_basis == 1:
-            if measurement_result == 1:
-                qc.x(0)
-            qc.h(0)
+        qc = circuits.eavesdrop(qc, rng)
     return qc
 
-def prepare_qubit(bit, basis):
-    qc = QuantumCircuit(1, 1)
-    if basis == 0:
-        if bit == 1:
-            qc.x(0)
-    else:
-        if bit == 1:
-            qc.x(0)
-        qc.h(0)
-    return qc
-
-def transmit(qc, loss_enable, perturbation_enable, sop_deviation_enable, eavesdrop_enable, param):
-    if not photon_survives(loss_enable, float(param["fiberLength"]), float(param["fiberLoss"]), float(param["detectorEfficiency"]), float(param["sourceEfficiency"])):
+def transmit(qc, loss_enable, perturbation_enable, sop_deviation_enable, eavesdrop_enable, param, rng=None):
+    rng = make_rng(rng)
+    if not photon_survives(loss_enable, float(param["fiberLength"]), float(param["fiberLoss"]), float(param["detectorEfficiency"]), float(param["sourceEfficiency"]), rng):
         return None
-    apply_perturbation(qc, 0, perturbation_enable, param["perturbProb"])
-    apply_sop_deviation(qc, 0, sop_deviation_enable, param["sopDeviation"])
-    qc = eavesdrop(qc, eavesdrop_enable)
+    apply_perturbation(qc, 0, perturbation_enable, param["perturbProb"], rng)
+    apply_sop_deviation(qc, 0, sop_deviation_enable, param["sopDeviation"], rng)
+    qc = eavesdrop(qc, eavesdrop_enable, rng)
     return qc
 
-def remove_measurements(qc):
-    qc2 = QuantumCircuit(qc.num_qubits, qc.num_clbits)
-    for instr, qargs, cargs in qc.data:
-        if instr.name != 'measure':
-            qc2.append(instr, qargs, cargs)
-    return qc2
-
-def measure_qubit_fast(qc, basis):
-    qc_no_meas = remove_measurements(qc)
-    sv = Statevector.from_instruction(qc_no_meas)
-    if basis == 1:
-        H = Operator.from_label('H')
-        sv = sv.evolve(H)
-    probs = sv.probabilities_dict()
-    rand = np.random.rand()
-    if rand < probs.get('0', 0):
-        return 0
-    else:
-        return 1
-
-
-import random
-
-def calculate_qber_sample(alice_bits, bob_bits, alice_bases, bob_bases, sample_fraction=0.1):
-    # Tìm các chỉ số có basis giống và bob đo được
-    matching_indices = [i for i, (a_base, b_base, b_bit) in enumerate(zip(alice_bases, bob_bases, bob_bits)) if a_base == b_base and b_bit is not None]
-
-    if len(matching_indices) == 0:
-        return 0
-
-    sample_size = max(1, int(len(matching_indices) * sample_fraction))  # ít nhất 1 bit
-    sample_indices = random.sample(matching_indices, sample_size)
-
-    num_errors = sum(1 for i in sample_indices if alice_bits[i] != bob_bits[i])
-    return num_errors / sample_size
-
-def bb84(n_bits, loss_enable, perturbation_enable, sop_deviation_enable, eavesdrop_enable, param):
-    start = time.time()
-    alice_bits = np.random.randint(0, 2, n_bits)
-    alice_bases = np.random.randint(0, 2, n_bits)
-    bob_bases   = np.random.randint(0, 2, n_bits)
-    end = time.time()
-    print(f"Khởi tạo bit và basis mất: {end - start:.3f}s")
-
-    raw_key = []
-    bob_bits = []
-    matching_bases_count = 0
-
+def qber_vs_interception(fractions, n_bits, perturbation_enable, sop_deviation_enable, param, block_size=1_000_000,
+                         seed=None):
+    # QBER theo tỉ lệ chặn của Eve, không tính mất mát kênh (chỉ các photon cùng basis).
+    # Mỗi điểm có luồng RNG con riêng (theo chỉ số điểm) nên kết quả lặp lại được với cùng seed.
+    chs = noise_channels(perturbation_enable, sop_deviation_enable, param)
+    qbers = []
+    for fraction, rng in zip(fractions, spawn(seed, len(fractions))):
+        eve = core.InterceptResend(fraction)
+        errors = matches = 0
+        for offset in range(0, n_bits, block_size):
+            n = min(block_size, n_bits - offset)
+            _, block_matches, block_errors = core.counts(core.simulate(n, chs, eve, rng=rng))
+            matches += block_matches
+            errors += block_errors
+        qbers.append(errors / matches if matches else 0)
+    return np.array(qbers)
+
+STREAM_CHUNK = 1_000_000
+
+def simulate_chunk(n_bits, loss_enable, perturbation_enable, sop_deviation_enable, eavesdrop_enable, param, rng,
+                   engine='numpy'):
+    chs = ([fiber_loss(param)] if loss_enable else []) + noise_channels(perturbation_enable, sop_deviation_enable, param)
+    run = core.simulate(n_bits, chs, eavesdropper(eavesdrop_enable, param), engine, rng)
+    return run.alice_bits, run.alice_bases, run.bob_bases, run.bob_bits, run.detected
+
+def _chunks(n_bits, loss_enable, perturbation_enable, sop_deviation_enable, eavesdrop_enable, param,
+            chunk_size=STREAM_CHUNK, seed=None, engine='numpy'):
+    # (offset, kết quả simulate_chunk) cho từng chunk, mỗi chunk một luồng RNG con của seed
+    for offset, rng in zip(range(0, n_bits, chunk_size), stream(seed)):
+        yield offset, simulate_chunk(min(chunk_size, n_bits - offset), loss_enable, perturbation_enable,
+                                     sop_deviation_enable, eavesdrop_enable, param, rng, engine)
+
+# seed: None, số nguyên, SeedSequence hoặc numpy.random.Generator (xem rng_streams). Chạy theo
+# cùng cách chia chunk như bb84_stream nên cùng seed cho cùng một lần chạy ở cả hai hàm.
+def bb84(n_bits, loss_enable, perturbation_enable, sop_deviation_enable, eavesdrop_enable, param, seed=None,
+         engine='numpy'):
     start = time.time()
-    for i, (bit, a_basis, b_basis) in enumerate(zip(alice_bits, alice_bases, bob_bases)):
-        qc = prepare_qubit(bit, a_basis)
-        qc_channel = transmit(qc, loss_enable, perturbation_enable, sop_deviation_enable, eavesdrop_enable, param)
-        if qc_channel is None:
-            raw_key.append((a_basis, b_basis, bit, None))
-            bob_bits.append(None)
-            continue
-        result = measure_qubit_fast(qc_channel, b_basis)
-        raw_key.append((a_basis, b_basis, bit, result))
-        bob_bits.append(result)
-        if a_basis == b_basis:
-            matching_bases_count += 1
+    rng = make_rng(seed)
+    chunks = [chunk for _, chunk in _chunks(n_bits, loss_enable, perturbation_enable, sop_deviation_enable,
+                                            eavesdrop_enable, param, seed=seed, engine=engine)]
+    if not chunks:
+        chunks = [simulate_chunk(0, loss_enable, perturbation_enable, sop_deviation_enable, eavesdrop_enable,
+                                 param, rng, engine)]
+    alice_bits, alice_bases, bob_bases, results, detected = (np.concatenate(arrays) for arrays in zip(*chunks))
+    bob_bits = np.where(detected, results, None).tolist()
+    matching = detected & (alice_bases == bob_bases)
+    matching_bases_count = int(np.count_nonzero(matching))
     end = time.time()
     print(f"Thời gian mô phỏng đo {n_bits} qubit: {end - start:.3f}s")
 
-    sifted_key = [str(bit) for (a, b, bit, res) in raw_key if res is not None and a == b and bit == res]
-    df = pd.DataFrame({
-        'Alice bit': alice_bits,
-        'Alice basis': alice_bases,
-        'Bob basis': bob_bases,
-        'Bob bit': bob_bits
-    })
-    print(df)
-    qber = calculate_qber_sample(alice_bits, np.array(bob_bits), alice_bases, bob_bases, sample_fraction=1)
+    sifted_key = alice_bits[matching & (alice_bits == results)].astype(str).tolist()
+    qber = calculate_qber_sample(alice_bits, np.array(bob_bits), alice_bases, bob_bases, sample_fraction=1, rng=rng)
     print(f"QBER: {qber}")
 
     return alice_bits, np.array(bob_bits), alice_bases, bob_bases, sifted_key, qber, matching_bases_count
 
+def bb84_stream(n_bits, loss_enable, perturbation_enable, sop_deviation_enable, eavesdrop_enable, param,
+                chunk_size=STREAM_CHUNK, seed=None, engine='numpy'):
+    # Giống bb84() nhưng chạy theo chunk cố định và yield từng đoạn khoá sift (uint8) kèm
+    # bộ đếm cộng dồn, nên bộ nhớ không tăng theo n_bits (chạy được 10^9 photon).
+    detections = matches = errors = 0
+    for offset, chunk in _chunks(n_bits, loss_enable, perturbation_enable, sop_deviation_enable,
+                                 eavesdrop_enable, param, chunk_size, seed, engine):
+        alice_bits, alice_bases, bob_bases, results, detected = chunk
+        n = len(alice_bits)
+        matching = detected & (alice_bases == bob_bases)
+        correct = matching & (alice_bits == results)
+        chunk_matches = int(np.count_nonzero(matching))
+
+        detections += int(np.count_nonzero(detected))
+        matches += chunk_matches
+        errors += chunk_matches - int(np.count_nonzero(correct))
+        yield {
+            'offset': offset,
+            'size': n,
+            'sifted_key': alice_bits[correct].astype(np.uint8),
+            'detections': detections,
+            'matches': matches,
+            'errors': errors,
+            'qber': errors / matches if matches else 0,
+        }
+
 def combined_efficiency_cal(source_efficiency, fiber_length,detector_efficiency, fiber_loss):
     total_loss_dB = fiber_length * fiber_loss
     CE = source_efficiency * 10**(-total_loss_dB/10) * detector_efficiency
@@ -0,0 +1,268 @@
+"""Benchmark các đường nóng của simulator, công thức và endpoint Flask, ghi kết quả ra JSON để so sánh.
+
+Mỗi benchmark chạy vài lần sau một lần khởi động (import, cache nguội...) và lấy median.
+Không cần mạng hay package ngoài requirements.
+
+    python benchmarks/run_benchmarks.py                        # chạy tất cả, in bảng
+    python benchmarks/run_benchmarks.py --json base.json       # lưu kết quả
+    python benchmarks/run_benchmarks.py --compare base.json    # so với lần trước, exit 1 nếu chậm hơn --threshold
+    python benchmarks/run_benchmarks.py -k cascade --repeat 3  # chỉ các benchmark có 'cascade' trong tên
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import numpy as np
+
+BENCHMARKS = []
+
+
+def benchmark(name, size=None, unit=None):
+    # Đăng ký benchmark. Hàm được trang trí là setup: trả về hàm không đối số cần đo.
+    # size/unit: khối lượng mỗi lần gọi (vd 10^5 qubit) để tính throughput size/giây.
+    def register(setup):
+        BENCHMARKS.append((name, setup, size, unit))
+        return setup
+    return register
+
+
+SIM_PARAMS = {'fiberLength': 10}
+SIM_SIZES = (1_000, 100_000, 1_000_000)
+
+for _n in SIM_SIZES:
+    @benchmark(f'bb84_no_Eve[{_n}]', _n, 'qubit')
+    def _bb84_no_eve(n=_n):
+        import bb84
+        return lambda: bb84.bb84_no_Eve(n, SIM_PARAMS, seed=1)
+
+    @benchmark(f'bb84_Eve[{_n}]', _n, 'qubit')
+    def _bb84_eve(n=_n):
+        import bb84
+        return lambda: bb84.bb84_Eve(n, SIM_PARAMS, seed=1)
+
+    @benchmark(f'bb84_packed[{_n}]', _n, 'qubit')
+    def _bb84_packed(n=_n):
+        import bb84
+        return lambda: bb84.bb84_packed(n, SIM_PARAMS, eve=True, seed=1)
+
+
+@benchmark('bb84_no_Eve_aer[20]', 20, 'qubit')
+def _bb84_aer():
+    import bb84
+    return lambda: bb84.bb84_no_Eve(20, SIM_PARAMS, engine='aer', seed=1)
+
+
+for _n in (1_000, 20_000):
+    @benchmark(f'bb84_no_Eve_aer_batched[{_n}]', _n, 'qubit')
+    def _bb84_aer_batched(n=_n):
+        import bb84
+        return lambda: bb84.bb84_no_Eve(n, SIM_PARAMS, engine='aer_batched', seed=1)
+
+
+FIBER_PARAM = {'fiberLength': 10, 'fiberLoss': 0.2, 'detectorEfficiency': 0.8, 'sourceEfficiency': 0.9,
+               'perturbProb': 0.1, 'sopDeviation': 0.1, 'qberFraction': 0.1, 'L': 1000}
+
+for _n in SIM_SIZES:
+    @benchmark(f'bb84_simulation.bb84[{_n}]', _n, 'qubit')
+    def _bb84_simulation(n=_n):
+        import bb84_simulation
+        return lambda: bb84_simulation.bb84(n, True, True, True, True, dict(FIBER_PARAM), seed=1)
+
+    @benchmark(f'bb84_fso.bb84[{_n}]', _n, 'qubit')
+    def _bb84_fso(n=_n):
+        import bb84_fso
+        return lambda: bb84_fso.bb84(n, True, True, True, True, dict(FIBER_PARAM), seed=1)
+
+
+@benchmark('measure_qubit_fast[x100]', 100, 'qubit')
+def _measure_qubit_fast():
+    from bb84_core.circuits import measure_qubit_fast, prepare_qubit
+    circuits = [prepare_qubit(i % 2, i // 2 % 2) for i in range(100)]
+    rng = np.random.default_rng(1)
+    return lambda: [measure_qubit_fast(qc, 1, rng) for qc in circuits]
+
+
+FORMULA_PARAMS = {'R': 1e9, 's': 0.5, 'p': 0.75, 'f': 1.0, 'd': 0.5, 'p_dark': 1e-4, 'P_AP': 0.02,
+                  'e_0': 0.5, 'e_pol': 0.01, 'n_s': 0.3, 'n_d': 0.09, 'zenith': 30, 'tau': 0.81}
+
+
+def _formula_call(func, method):
+    import formular
+    from yudai.fso_link_muy_sigma_change import AtmosphericChannel
+    p = FORMULA_PARAMS
+    channel = AtmosphericChannel(tau_zen=p['tau'], H_source=500e3)
+    if func == 'qber_cal':
+        return lambda: formular.qber_cal(p['p_dark'], p['P_AP'], p['e_0'], p['e_pol'], p['n_s'], channel,
+                                         p['zenith'], method=method)
+    return lambda: formular.compute_SKR(p['R'], p['s'], p['p'], p['d'], p['f'], p['p_dark'], p['e_0'],
+                                        p['e_pol'], p['n_s'], p['n_d'], p['P_AP'], channel, p['zenith'],
+                                        method=method)
+
+
+for _func in ('qber_cal', 'compute_SKR'):
+    for _method in ('quad', 'grid'):
+        @benchmark(f'formular.{_func}[{_method}]')
+        def _formula(func=_func, method=_method):
+            return _formula_call(func, method)
+
+
+@benchmark('formular.sweep[zenith 60 x tau 20]', 1200, 'point')
+def _sweep():
+    import formular
+    zenith, tau = np.linspace(0, 70, 60), np.linspace(0.5, 0.95, 20)
+    return lambda: formular.sweep(FORMULA_PARAMS, zenith=zenith, tau=tau)
+
+
+@benchmark('AtmosphericChannel.prepare_parameters')
+def _prepare_parameters():
+    from yudai.fso_link_muy_sigma_change import AtmosphericChannel
+    channel = AtmosphericChannel(tau_zen=0.81, H_source=500e3)
+    zeniths = iter(np.linspace(0, 70, 1_000_000))
+    # zenith mới mỗi lần để không đo phần đã nhớ trong channel
+    return lambda: channel.prepare_parameters(next(zeniths))
+
+
+@benchmark('AtmosphericChannel.sample[10^6]', 1_000_000, 'sample')
+def _sample():
+    from yudai.fso_link_muy_sigma_change import AtmosphericChannel
+    channel = AtmosphericChannel(tau_zen=0.81, H_source=500e3)
+    rng = np.random.default_rng(1)
+    return lambda: channel.sample(30, 1_000_000, rng)
+
+
+for _n in (100_000, 1_000_000, 4_000_000):
+    @benchmark(f'cascade[{_n}]', _n, 'bit')
+    def _cascade(n=_n):
+        import reconciliation
+        rng = np.random.default_rng(1)
+        alice = rng.integers(0, 2, n, dtype=np.uint8)
+        bob = alice ^ (rng.random(n) < 0.03)
+        return lambda: reconciliation.cascade(alice, bob, rng=2)
+
+
+for _n in (1_000_000, 10_000_000):
+    @benchmark(f'privacy_amplification[{_n}]', _n, 'bit')
+    def _privacy_amplification(n=_n):
+        import privacy_amplification
+        key = np.random.default_rng(1).integers(0, 2, n, dtype=np.uint8)
+        return lambda: privacy_amplification.privacy_amplification(key, 0.03, rng=2)
+
+
+@benchmark('decoy_simulation[10^6]', 1_000_000, 'pulse')
+def _decoy():
+    import decoy_simulation
+    params = dict(FORMULA_PARAMS)
+    return lambda: decoy_simulation.simulate_decoy(1_000_000, params, seed=1)
+
+
+ENDPOINTS = [
+    ('/bb84', {'bitCount': 10_000, 'seed': 1}),
+    ('/bb84', {'bitCount': 10_000, 'isEveMode': True, 'seed': 1, 'format': 'packed'}),
+    ('/bb84_circuit', {'alice_bits': [0, 1] * 10, 'alice_bases': [0, 0, 1, 1] * 5, 'bob_bases': [1, 0] * 10,
+                       'perturbProbability': 0.2, 'seed': 1}),
+    ('/bb84_simu', {'zenith': 30, 'tau_zen': 0.8}),
+    ('/plot_simulation', {'name_x': 'Zenith', 'name_y': 'QBER', 'start_value_x': 0, 'end_value_x': 60,
+                          'point': 10}),
+    ('/plot_simulation', {'name_x': 'Zenith', 'name_y': 'QBER', 'start_value_x': 0, 'end_value_x': 60,
+                          'point': 10, 'method': 'grid'}),
+    ('/sweep_simulation', {'axes': {'zenith': list(range(0, 70, 5)), 'tau': [0.6, 0.7, 0.8, 0.9]}}),
+]
+
+for _url, _body in ENDPOINTS:
+    _label = _body.get('format') or _body.get('method') or ('eve' if _body.get('isEveMode') else '')
+    @benchmark(f'POST {_url}' + (f'[{_label}]' if _label else ''))
+    def _endpoint(url=_url, body=_body):
+        import sever
+        client = sever.app.test_client()
+
+        def call():
+            # đo tính toán thật, không đo response đã cache
+            sever.response_cache.clear()
+            response = client.post(url, json=body)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} -> {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return call
+
+
+def run(name, setup, size, unit, repeat):
+    func = setup()
+    times = []
+    # bỏ các dòng print thời gian/QBER của simulator khỏi bảng kết quả
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()  # khởi động: import, cấp phát lần đầu
+        for _ in range(repeat):
+            t = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - t)
+    result = {'median_s': statistics.median(times), 'min_s': min(times), 'repeat': repeat}
+    if size:
+        result.update(size=size, unit=unit, throughput=size / result['median_s'])
+    return result
+
+
+def compare(results, baseline, threshold):
+    # In tỉ lệ thời gian so với baseline; trả về danh sách benchmark chậm hơn threshold
+    regressions = []
+    print(f"\n{'benchmark':<44}{'base ms':>12}{'now ms':>12}{'ratio':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['median_s'] / baseline[name]['median_s']
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<44}{baseline[name]['median_s'] * 1000:12.2f}{result['median_s'] * 1000:12.2f}"
+              f"{ratio:8.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='filter', help="chỉ chạy benchmark có chuỗi này trong tên")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="ghi kết quả ra file JSON")
+    parser.add_argument('--compare', help="file JSON của lần chạy trước để so sánh")
+    parser.add_argument('--threshold', type=float, default=0.1, help="chậm hơn bao nhiêu thì tính là hồi quy")
+    parser.add_argument('--list', action='store_true', help="chỉ liệt kê tên benchmark")
+    args = parser.parse_args()
+
+    selected = [b for b in BENCHMARKS if not args.filter or args.filter in b[0]]
+    if args.list:
+        print('\n'.join(b[0] for b in selected))
+        return
+
+    results = {}
+    for name, setup, size, unit in selected:
+        result = run(name, setup, size, unit, args.repeat)
+        results[name] = result
+        line = f"{name:<44}{result['median_s'] * 1000:12.2f} ms"
+        if size:
+            line += f"{result['throughput']:14.4g} {unit}/s"
+        print(line, flush=True)
+
+    if args.json:
+        meta = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                'platform': platform.platform(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with open(args.json, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Đo thời gian khởi động nguội của sever.py và độ trễ request đầu tiên của từng endpoint.
+
+Mỗi lần đo chạy trong một process Python mới (import nguội thật sự).
+
+    python benchmarks/startup.py                 # 5 lần, in bảng
+    python benchmarks/startup.py --runs 10 --json startup.json
+    python benchmarks/startup.py --warmup        # bật BB84_WARMUP, đợi warm-up xong rồi mới gửi request
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Chạy trong process con: đo import sever rồi lần lượt gọi request đầu tiên của từng endpoint
+_PROBE = r'''
+import json, sys, time
+t = time.perf_counter()
+import sever
+timings = {'import': time.perf_counter() - t}
+timings['modules_loaded'] = sorted(m for m in ('qiskit', 'qiskit_aer', 'scipy', 'matplotlib', 'pandas', 'formular')
+                                   if m in sys.modules)
+if sys.argv[1] == '1':
+    t = time.perf_counter()
+    sever.warm_up()
+    timings['warm_up'] = time.perf_counter() - t
+client = sever.app.test_client()
+requests = [
+    ('bb84', '/bb84', {'bitCount': 1000}),
+    ('bb84_circuit', '/bb84_circuit', {'alice_bits': [0, 1] * 10, 'alice_bases': [0, 0, 1, 1] * 5,
+                                       'bob_bases': [1, 0] * 10, 'perturbProbability': 0.2}),
+    ('bb84_simu', '/bb84_simu', {'zenith': 30, 'tau_zen': 0.8}),
+    ('plot_simulation', '/plot_simulation', {'name_x': 'Zenith', 'name_y': 'QBER', 'start_value_x': 0,
+                                             'end_value_x': 60, 'point': 10}),
+]
+for name, url, body in requests:
+    t = time.perf_counter()
+    status = client.post(url, json=body).status_code
+    timings[name] = time.perf_counter() - t
+    if status != 200:
+        timings[name + '_status'] = status
+print(json.dumps(timings))
+'''
+
+
+def probe(warmup):
+    env = dict(os.environ, MPLBACKEND='Agg')
+    env.pop('BB84_WARMUP', None)
+    out = subprocess.run([sys.executable, '-c', _PROBE, '1' if warmup else '0'], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warmup', action='store_true', help="gọi sever.warm_up() trước các request")
+    parser.add_argument('--json', help="ghi kết quả (median theo giây) ra file JSON")
+    args = parser.parse_args()
+
+    runs = [probe(args.warmup) for _ in range(args.runs)]
+    keys = [k for k, v in runs[0].items() if isinstance(v, float)]
+    summary = {k: statistics.median(r[k] for r in runs) for k in keys}
+    summary['modules_loaded'] = runs[0]['modules_loaded']
+
+    for k in keys:
+        print(f"{k:<18}{summary[k] * 1000:10.1f} ms")
+    print(f"{'loaded at import':<18}{', '.join(summary['modules_loaded']) or '-'}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': args.runs, 'warmup': args.warmup, 'median_s': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
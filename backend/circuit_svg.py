@@ -0,0 +1,110 @@
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+# Vẽ mạch BB84 thẳng ra SVG từ mảng bit/basis, không qua Qiskit + matplotlib.
+# Bố cục cột giống build_full_circuit: chuẩn bị (X, H) | Eve H | RY nhiễu, Bob H | đo.
+GATE_COLORS = {'X': '#05BAB6', 'H': '#6FA4FF', 'RY': '#BB8BFF', 'M': '#A0A0A0'}
+
+WIRE_GAP = 40
+COL_WIDTH = 56
+GATE_SIZE = 30
+LEFT = 50
+TOP = 30
+
+
+def circuit_columns(alice_bits, alice_bases, bob_bases, eve_bases=None, ry_angles=None):
+    # Danh sách cột; mỗi cột là 'barrier' hoặc dict qubit -> (tên cổng, nhãn phụ).
+    # Cột rỗng bị bỏ giống idle_wires=False của Qiskit.
+    n = len(alice_bits)
+    prep_x = {i: ('X', None) for i in range(n) if alice_bits[i] == 1}
+    prep_h = {i: ('H', None) for i in range(n) if alice_bases[i] == 1}
+    columns = [prep_x, prep_h, 'barrier']
+    if eve_bases is not None and any(eve_bases):
+        columns += [{i: ('H', None) for i in range(n) if eve_bases[i] == 1}, 'barrier']
+    if ry_angles is not None:
+        columns.append({i: ('RY', f"{theta:.2f}") for i, theta in enumerate(ry_angles) if theta is not None})
+    columns += [{i: ('H', None) for i in range(n) if bob_bases[i] == 1}, 'barrier']
+    # mỗi phép đo một cột để mũi tên xuống thanh ghi cổ điển không đè lên nhau
+    columns += [{i: ('M', str(i))} for i in range(n)]
+    return [c for c in columns if c == 'barrier' or c]
+
+
+def _gate(x, y, name, label):
+    half = GATE_SIZE / 2
+    parts = [f'<rect x="{x - half}" y="{y - half}" width="{GATE_SIZE}" height="{GATE_SIZE}" '
+             f'fill="{GATE_COLORS[name]}" stroke="{GATE_COLORS[name]}"/>']
+    if name == 'M':
+        parts.append(f'<path d="M{x - 10} {y + 6} A 10 10 0 0 1 {x + 10} {y + 6}" fill="none" stroke="#000"/>'
+                     f'<line x1="{x}" y1="{y + 6}" x2="{x + 8}" y2="{y - 8}" stroke="#000"/>')
+    elif name == 'RY':
+        parts.append(f'<text x="{x}" y="{y - 2}" font-size="11">R<tspan font-size="8" dy="2">Y</tspan></text>'
+                     f'<text x="{x}" y="{y + 10}" font-size="8">{escape(label)}</text>')
+    else:
+        parts.append(f'<text x="{x}" y="{y + 5}" font-size="14">{name}</text>')
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=256)
+def _layout(alice_bits, alice_bases, bob_bases, eve_bases, ry_column):
+    # SVG (chưa đóng thẻ) của mọi thứ trừ các cổng RY, cùng toạ độ x của cột RY (None nếu
+    # không có). Góc RY ngẫu nhiên theo từng request nên không nằm trong khoá cache.
+    n = len(alice_bits)
+    columns = circuit_columns(alice_bits, alice_bases, bob_bases, eve_bases, (0.0,) * n if ry_column else None)
+    ry_x = None
+    width = LEFT + COL_WIDTH * len(columns) + 30
+    creg_y = TOP + WIRE_GAP * n
+    height = creg_y + 30
+
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+           f'viewBox="0 0 {width} {height}" font-family="sans-serif" text-anchor="middle">',
+           f'<rect width="{width}" height="{height}" fill="#fff"/>']
+    for i in range(n):
+        y = TOP + WIRE_GAP * i
+        out.append(f'<text x="{LEFT - 25}" y="{y + 5}" font-size="13">q<tspan font-size="9" dy="3">{i}</tspan></text>'
+                   f'<line x1="{LEFT}" y1="{y}" x2="{width - 10}" y2="{y}" stroke="#000"/>')
+    # thanh ghi cổ điển gộp (cregbundle)
+    out.append(f'<text x="{LEFT - 25}" y="{creg_y + 5}" font-size="13">c</text>'
+               f'<line x1="{LEFT}" y1="{creg_y - 2}" x2="{width - 10}" y2="{creg_y - 2}" stroke="#777"/>'
+               f'<line x1="{LEFT}" y1="{creg_y + 2}" x2="{width - 10}" y2="{creg_y + 2}" stroke="#777"/>'
+               f'<text x="{LEFT + 10}" y="{creg_y - 6}" font-size="9">{n}</text>')
+
+    for k, column in enumerate(columns):
+        x = LEFT + COL_WIDTH * k + COL_WIDTH / 2
+        if column == 'barrier':
+            out.append(f'<rect x="{x - 6}" y="{TOP - WIRE_GAP / 2}" width="12" height="{WIRE_GAP * n}" fill="#DDD" '
+                       f'opacity="0.6"/><line x1="{x}" y1="{TOP - WIRE_GAP / 2}" x2="{x}" '
+                       f'y2="{TOP + WIRE_GAP * (n - 0.5)}" stroke="#000" stroke-dasharray="4 3"/>')
+            continue
+        if any(name == 'RY' for name, _ in column.values()):
+            ry_x = x
+            continue
+        for i, (name, label) in sorted(column.items()):
+            y = TOP + WIRE_GAP * i
+            if name == 'M':
+                out.append(f'<line x1="{x - 2}" y1="{y}" x2="{x - 2}" y2="{creg_y - 8}" stroke="#777"/>'
+                           f'<line x1="{x + 2}" y1="{y}" x2="{x + 2}" y2="{creg_y - 8}" stroke="#777"/>'
+                           f'<path d="M{x - 6} {creg_y - 8} L{x + 6} {creg_y - 8} L{x} {creg_y} Z" fill="#777"/>'
+                           f'<text x="{x + 10}" y="{creg_y + 14}" font-size="9">{label}</text>')
+            out.append(_gate(x, y, name, label))
+    return ''.join(out), ry_x
+
+
+def render_svg(alice_bits, alice_bases, bob_bases, eve_bases=None, ry_angles=None):
+    # ry_angles: góc RY theo từng qubit, None nếu qubit đó không bị nhiễu.
+    # Bố cục được nhớ theo bit/basis, chỉ các cổng RY được vẽ lại mỗi lần.
+    def bits(values):
+        return None if values is None else tuple(int(v) for v in values)
+
+    ry_column = ry_angles is not None and any(t is not None for t in ry_angles)
+    head, ry_x = _layout(bits(alice_bits), bits(alice_bases), bits(bob_bases), bits(eve_bases), ry_column)
+    out = [head]
+    if ry_x is not None:
+        out += [_gate(ry_x, TOP + WIRE_GAP * i, 'RY', f"{float(theta):.2f}")
+                for i, theta in enumerate(ry_angles) if theta is not None]
+    out.append('</svg>')
+    return ''.join(out)
+
+
+def cache_stats():
+    info = _layout.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxsize': info.maxsize}
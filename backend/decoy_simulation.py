@@ -0,0 +1,107 @@
+import time
+
+import numpy as np
+
+import formular
+from rng_streams import stream
+from yudai.fso_link_muy_sigma_change import AtmosphericChannel
+
+# Mô phỏng Monte Carlo theo từng xung cho BB84 decoy-state, cùng mô hình với
+# formular.Q_muy / EQ_muy để kiểm tra chéo các số của /bb84_simu:
+#   - mỗi xung được gán nhãn signal (cường độ n_s, xác suất p_signal) hoặc decoy (n_d)
+#   - eta của từng xung lấy từ AtmosphericChannel.sample (phân phối f_eta theo zenith, tau)
+#   - số photon tới detector ~ Poisson(n * eta) (Poisson(n) lọc Bernoulli(eta) vẫn là Poisson)
+#   - click do photon lỗi với xác suất e_pol, dark count (p_dark) lỗi với xác suất e_0
+#   - mỗi click (photon hay dark count) kéo theo afterpulse với xác suất P_AP, lỗi với xác
+#     suất e_0; afterpulse được cộng vào chính xung gây ra nó như trong Q_muy
+# Các sự kiện được đếm cộng dồn (không gộp click trùng trong một xung), giống công thức
+# giải tích. Xung được xử lý theo chunk nên 10^8 xung vẫn chạy trong bộ nhớ cố định.
+DECOY_CLASSES = ('signal', 'decoy')
+DECOY_CHUNK = 1 << 20
+
+
+def _tally(counts, labels, errors):
+    # cộng số click và số lỗi của các sự kiện (nhãn của xung, có lỗi hay không) vào counts
+    counts['clicks'] += np.bincount(labels, minlength=2)
+    counts['errors'] += np.bincount(labels, weights=errors, minlength=2).astype(np.int64)
+
+
+def simulate_chunk(n, params, channel, rng):
+    # Số xung, click và lỗi theo từng lớp cường độ cho n xung
+    counts = {name: np.zeros(2, dtype=np.int64) for name in ('pulses', 'clicks', 'errors')}
+    labels = (rng.random(n) >= params.get('p_signal', 0.5)).astype(np.intp)
+    counts['pulses'] += np.bincount(labels, minlength=2)
+
+    eta = np.atleast_1d(channel.sample(params['zenith'], n, rng))
+    intensity = np.array([params['n_s'], params['n_d']])[labels]
+    photon_clicks = np.flatnonzero(rng.poisson(intensity * eta))
+    # dark count theo vị trí đều (có thể trùng xung, cộng dồn như p_dark trong Q_muy)
+    dark_clicks = rng.integers(0, n, rng.binomial(n, params['p_dark']))
+
+    for clicks, e in ((photon_clicks, params['e_pol']), (dark_clicks, params['e_0'])):
+        _tally(counts, labels[clicks], rng.random(len(clicks)) < e)
+        afterpulses = clicks[rng.random(len(clicks)) < params['P_AP']]
+        _tally(counts, labels[afterpulses], rng.random(len(afterpulses)) < params['e_0'])
+    return counts
+
+
+def simulate_decoy(n_pulses, params, channel=None, chunk_size=DECOY_CHUNK, seed=None, progress=None):
+    # params: như formular.simulation_QBer (n_s, n_d, p_dark, P_AP, e_0, e_pol, zenith, tau),
+    # thêm 'p_signal' (mặc định 0.5). Mỗi chunk có luồng RNG con riêng (rng_streams.stream).
+    start = time.time()
+    if channel is None:
+        channel = AtmosphericChannel(tau_zen=params['tau'], H_source=500e3)
+    totals = {name: np.zeros(2, dtype=np.int64) for name in ('pulses', 'clicks', 'errors')}
+    for offset, rng in zip(range(0, n_pulses, chunk_size), stream(seed)):
+        n = min(chunk_size, n_pulses - offset)
+        for name, value in simulate_chunk(n, params, channel, rng).items():
+            totals[name] += value
+        if progress is not None:
+            progress((offset + n) / n_pulses)
+
+    result = {'n_pulses': n_pulses, 'seconds': time.time() - start}
+    for i, name in enumerate(DECOY_CLASSES):
+        pulses, clicks, errors = (int(totals[k][i]) for k in ('pulses', 'clicks', 'errors'))
+        result[name] = {
+            'pulses': pulses,
+            'clicks': clicks,
+            'errors': errors,
+            'gain': clicks / pulses if pulses else 0.0,
+            # độ lệch chuẩn xấp xỉ Poisson của số sự kiện
+            'gain_std': np.sqrt(clicks) / pulses if pulses else 0.0,
+            'error_gain': errors / pulses if pulses else 0.0,
+            'error_rate': errors / clicks if clicks else 0.0,
+        }
+    return result
+
+
+def analytic_gains(params, channel=None):
+    # <Q> và <EQ> của từng lớp theo formular (tích phân lưới trên f_eta)
+    if channel is None:
+        channel = AtmosphericChannel(tau_zen=params['tau'], H_source=500e3)
+    eta, weights = formular.pdf_nodes(channel, params['zenith'])
+    p = params
+    gains = {}
+    for name, intensity in zip(DECOY_CLASSES, (p['n_s'], p['n_d'])):
+        Q = float(np.sum(formular.Q_muy(eta, p['p_dark'], p['P_AP'], intensity) * weights))
+        EQ = float(np.sum(formular.EQ_muy(eta, p['p_dark'], p['P_AP'], p['e_0'], p['e_pol'], intensity) * weights))
+        gains[name] = {'gain': Q, 'error_gain': EQ, 'error_rate': EQ / Q}
+    return gains
+
+
+def cross_check(result, params, channel=None):
+    # Đặt kết quả Monte Carlo cạnh giá trị giải tích; z = (MC - giải tích) / độ lệch chuẩn của MC
+    expected = analytic_gains(params, channel)
+    check = {'n_pulses': result['n_pulses'], 'seconds': result['seconds']}
+    for name in DECOY_CLASSES:
+        mc, ref = result[name], expected[name]
+        error_std = np.sqrt(mc['errors']) / mc['pulses'] if mc['pulses'] else 0.0
+        check[name] = {
+            'gain': mc['gain'],
+            'gain_analytic': ref['gain'],
+            'gain_z': (mc['gain'] - ref['gain']) / mc['gain_std'] if mc['gain_std'] else 0.0,
+            'error_rate': mc['error_rate'],
+            'error_rate_analytic': ref['error_rate'],
+            'error_gain_z': (mc['error_gain'] - ref['error_gain']) / error_std if error_std else 0.0,
+        }
+    return check
@@ -0,0 +1,77 @@
+import numpy as np
+from scipy.signal import lfilter
+from scipy.special import erfc
+
+from rng_streams import make_rng
+
+# Chuỗi fading tương quan theo thời gian cho một khối photon liên tiếp.
+# Biến ẩn z là quá trình Gauss AR(1) chuẩn hoá (phương sai 1), hệ số tương quan giữa hai
+# lần cập nhật là exp(-dt / coherence_time). z được giữ nguyên trong 'hold' photon
+# (updates_per_coherence lần cập nhật trong một coherence time) nên ở tốc độ GHz không
+# phải sinh số ngẫu nhiên cho từng photon. Sau đó z được đổi sang phân phối biên:
+#   'lognormal': exp(-sigma2 / 2 + sqrt(sigma2) z), trung bình 1 (như bb84_fso cũ)
+#   'f_eta':     copula Gauss, eta = F^-1(Phi(z)) với F là CDF của AtmosphericChannel.f_eta
+#                (eta đã gồm cả suy hao đường truyền khí quyển)
+FADING_MODELS = ('lognormal', 'f_eta')
+
+
+class FadingProcess:
+    def __init__(self, model='lognormal', coherence_time=None, source_rate=1e9, sigma2=np.log(1.5),
+                 channel=None, zenith=30, updates_per_coherence=64, rng=None):
+        if model not in FADING_MODELS:
+            raise ValueError(f"Unknown fading model: {model}")
+        self.model = model
+        self.sigma2 = sigma2
+        self.rng = make_rng(rng)
+        if coherence_time is None:
+            # như bb84_fso cũ: mẫu độc lập, lấy lại mỗi 100 photon
+            self.hold = 100
+            self.rho = 0.0
+        else:
+            coherence_photons = coherence_time * source_rate
+            self.hold = max(1, int(coherence_photons // updates_per_coherence))
+            self.rho = float(np.exp(-self.hold / coherence_photons))
+        if model == 'f_eta':
+            from yudai.fso_link_muy_sigma_change import AtmosphericChannel, fading_table_cache
+            channel = channel if channel is not None else AtmosphericChannel(H_source=500e3)
+            self._table = fading_table_cache.prepare(channel, zenith)
+        self._z = None      # giá trị z của trạng thái hiện tại
+        self._value = None  # fading tương ứng
+        self._used = 0      # số photon đã dùng trạng thái hiện tại
+
+    def _latent(self, m):
+        # m giá trị z tiếp theo của AR(1), nối tiếp trạng thái trước (bắt đầu từ phân phối dừng)
+        z_prev = self.rng.standard_normal() if self._z is None else self._z
+        eps = self.rng.standard_normal(m)
+        return lfilter([np.sqrt(1 - self.rho ** 2)], [1, -self.rho], eps, zi=[self.rho * z_prev])[0]
+
+    def _marginal(self, z):
+        if self.model == 'lognormal':
+            return np.exp(-self.sigma2 / 2 + np.sqrt(self.sigma2) * z)
+        cdf, v, log_scale = self._table
+        return np.exp(np.interp(0.5 * erfc(-z / np.sqrt(2)), cdf, v) + log_scale)
+
+    def block(self, n):
+        # Fading cho n photon tiếp theo; gọi nhiều lần thì chuỗi nối tiếp liên tục
+        out = np.empty(n)
+        pos = 0
+        if self._z is not None and self._used < self.hold:
+            pos = min(n, self.hold - self._used)
+            out[:pos] = self._value
+            self._used += pos
+        remaining = n - pos
+        if remaining > 0:
+            m = -(-remaining // self.hold)
+            z = self._latent(m)
+            values = self._marginal(z)
+            out[pos:] = np.repeat(values, self.hold)[:remaining]
+            self._z, self._value = z[-1], values[-1]
+            self._used = remaining - (m - 1) * self.hold
+        return out
+
+
+def burst_lengths(detected):
+    # Độ dài các chuỗi photon bị mất liên tiếp, để xem ảnh hưởng của fading chậm
+    lost = np.concatenate(([False], ~np.asarray(detected, dtype=bool), [False]))
+    edges = np.flatnonzero(np.diff(lost.astype(np.int8)))
+    return edges[1::2] - edges[::2]
@@ -4,6 +4,11 @@ from yudai.fso_link_muy_sigma_change import *
 
 # Hàm Shannon entropy có kiểm tra biên
 def H_2(p):
+    if np.ndim(p) > 0:
+        p = np.asarray(p, dtype=float)
+        inside = (p > 0) & (p < 1)
+        q = np.where(inside, p, 0.5)
+        return np.where(inside, -q * np.log2(q) - (1 - q) * np.log2(1 - q), 0.0)
     if p <= 0:
         return 0
     if p >= 1:
@@ -21,9 +26,70 @@ def EQ_muy(eta, p_dark, P_AP, e_0, e_pol, n_s):
     p_dark_new = p_dark * (1 + P_AP)
     return e_0 * p_dark_new + (e_pol + e_0 * P_AP) * (1 - np.exp(-n_s * eta))
 
+# Chế độ tích phân 'grid': thay vì quad trên [0, inf) với callback vô hướng, f_eta
+# được tính một lần trên một lưới nút cố định và mọi tích phân dùng lại các giá trị đó.
+#
+# Với v = ln(eta / (A_mod * eta_l)), f_eta(eta) * eta là mật độ của tổng một biến
+# pointing-error (phân phối mũ với tham số phi_mod^2 trên v <= 0) và một biến chuẩn
+# N(-sigma_R^2 / 2, sigma_R^2). Mật độ này trơn và giảm theo hàm mũ ở cả hai phía nên
+# quy tắc hình thang đều trên v hội tụ rất nhanh. Lưới bị cắt ở chỗ phần đuôi bỏ đi
+# nhỏ hơn 1e-16: 9 sigma_R ở phía trên, thêm ln(1e-16) / phi_mod^2 ở phía dưới.
+#
+# Gần đường chân trời cận dưới của v xuống tới -900 (85 độ) hay thấp hơn nhiều, khi đó eta =
+# A_mod * eta_l * exp(v) về 0 và f_eta(0) * 0 cho NaN. Vì vậy trọng số được tính thẳng theo
+# v bằng channel.f_v (miền log), lưới bắt đầu từ eta = ETA_FLOOR và phần khối lượng dưới
+# ngưỡng (1 - tổng trọng số) được dồn vào nút đầu, tức tính như eta = 0: chỉ còn dark count
+# và afterpulse, đúng giới hạn vật lý.
+#
+# Sai số: với GRID_NODES = 512 nút (đã hội tụ từ khoảng 256 nút), các trung bình
+# khớp với tích phân tham chiếu hội tụ tới ~1e-12 tương đối, và QBER/SKR lệch dưới
+# 1e-5 tương đối so với chế độ 'quad' (chủ yếu do sai số epsabs=1e-9 của quad) cho
+# zenith 0-75 độ. Từ 75 đến 90 độ lưới vẫn cho kết quả hữu hạn, hội tụ theo số nút (512 và
+# 4096 nút lệch dưới 1e-6 tương đối) và tiến về giới hạn chỉ có dark count (QBER -> e_0)
+# khi zenith -> 90. Ở đó quad không dùng được: với tau_zen nhỏ nó báo IntegrationWarning
+# và cho QBER âm, từ ~89.5 độ thì A_mod tràn số.
+GRID_NODES = 512
+_TAIL_SIGMA = 9
+_TAIL_LOG = np.log(1e-16)
+
+
+def pdf_nodes(channel, zenith, n_nodes=GRID_NODES):
+    # Trả về (eta, weights) sao cho trung bình <g> = sum(g(eta) * weights, axis=0).
+    # zenith (và channel.tau_zen) có thể là mảng: kết quả có thêm trục đầu dài n_nodes,
+    # nên các tham số khác cùng shape với zenith broadcast được trực tiếp.
+    if np.ndim(zenith) == 0 and np.ndim(channel.tau_zen) == 0:
+        prepared = log_prepare_cache.prepare(channel, zenith)
+    else:
+        prepared = channel.prepare_log_parameters(np.asarray(zenith, dtype=float))
+    phi_mod, log_A_mod, log_eta_l, mu, sigma_R = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in prepared))
+
+    node_shape = (n_nodes,) + (1,) * phi_mod.ndim
+    log_scale = log_A_mod + log_eta_l
+    v_lo, v_hi = fading_log_support(phi_mod, sigma_R, _TAIL_SIGMA, _TAIL_LOG, log_scale)
+    t = np.linspace(0.0, 1.0, n_nodes).reshape(node_shape)
+    v = v_lo + (v_hi - v_lo) * t
+    eta = np.exp(v + log_scale)
+
+    trapezoid = np.full(n_nodes, 1.0)
+    trapezoid[[0, -1]] = 0.5
+    weights = (channel.f_v(v, phi_mod, mu, sigma_R)
+               * (v_hi - v_lo) / (n_nodes - 1) * trapezoid.reshape(node_shape))
+    weights[0] += np.maximum(1 - weights.sum(axis=0), 0)
+    return eta, weights
+
+
 # Tính QBER trung bình và Qμ trung bình
-def qber_cal(p_dark, P_AP, e_0, e_pol, n_s, channel,zenith):
-    phi_mod, A_mod, eta_l, mu, sigma_R = channel.prepare_parameters(zenith=zenith)
+def qber_cal(p_dark, P_AP, e_0, e_pol, n_s, channel,zenith, method='quad', nodes=None):
+    if method == 'grid':
+        eta, weights = nodes if nodes is not None else pdf_nodes(channel, zenith)
+        numerator_inter = np.sum(EQ_muy(eta, p_dark, P_AP, e_0, e_pol, n_s) * weights, axis=0)
+        denominator_inter = np.sum(Q_muy(eta, p_dark, P_AP, n_s) * weights, axis=0)
+        return numerator_inter / denominator_inter, denominator_inter
+    if method != 'quad':
+        raise ValueError(f"Unknown integration method: {method}")
+
+    phi_mod, A_mod, eta_l, mu, sigma_R = prepare_cache.prepare(channel, zenith)
 
     def numerator(eta):
         return EQ_muy(eta, p_dark, P_AP, e_0, e_pol, n_s) * channel.f_eta(eta, phi_mod, A_mod, eta_l, mu, sigma_R)
@@ -37,11 +103,9 @@ def qber_cal(p_dark, P_AP, e_0, e_pol, n_s, channel,zenith):
     return numerator_inter / denominator_inter, denominator_inter
 
 # Hàm tính SKR hoàn chỉnh
-def compute_SKR(R, s, p, d, f, p_dark, e_0, e_pol, n_s, n_d, P_AP, channel,zenith):
-    phi_mod, A_mod, eta_l, mu, sigma_R = channel.prepare_parameters(zenith=zenith)
-
-    # Hàm tính Q1 lower bound
-    def Q_1_L(eta):
+def compute_SKR(R, s, p, d, f, p_dark, e_0, e_pol, n_s, n_d, P_AP, channel,zenith, method='quad', nodes=None):
+    # Hàm tính Q1 lower bound (chưa nhân f_eta)
+    def Q_1_L_core(eta):
         Q_nu = Q_muy(eta, p_dark, P_AP, n_d)
         Q_mu = Q_muy(eta, p_dark, P_AP, n_s)
 
@@ -50,10 +114,10 @@ def compute_SKR(R, s, p, d, f, p_dark, e_0, e_pol, n_s, n_d, P_AP, channel,zenit
                  - Q_mu * np.exp(n_s) * (n_d ** 2 / n_s ** 2)
                  - ((n_s ** 2 - n_d ** 2) / n_s ** 2) * (p_dark * (1 + P_AP)))
 
-        return temp1 * temp2 * channel.f_eta(eta, phi_mod, A_mod, eta_l, mu, sigma_R)
+        return temp1 * temp2
 
-    # Hàm tính e1 upper bound
-    def e1_U(eta):
+    # Hàm tính e1 upper bound (chưa nhân f_eta)
+    def e1_U_core(eta):
         Q_nu = Q_muy(eta, p_dark, P_AP, n_d)
         Q_mu = Q_muy(eta, p_dark, P_AP, n_s)
         E_nu_Q_nu = EQ_muy(eta, p_dark, P_AP, e_0, e_pol, n_s)
@@ -66,28 +130,50 @@ def compute_SKR(R, s, p, d, f, p_dark, e_0, e_pol, n_s, n_d, P_AP, channel,zenit
 
         Y_1L = temp2 * temp3
 
-        return ((E_nu_Q_nu * np.exp(n_d) - temp1) / (Y_1L*n_d)) * Q_1_L(eta)
+        return ((E_nu_Q_nu * np.exp(n_d) - temp1) / (Y_1L*n_d)) * Q_1_L_core(eta)
+
+    if method == 'grid':
+        # Cả bốn tích phân dùng chung một lần tính f_eta trên lưới
+        if nodes is None:
+            nodes = pdf_nodes(channel, zenith)
+        eta, weights = nodes
+        avg_Q_1_L = np.sum(Q_1_L_core(eta) * weights, axis=0)
+        integral_e1 = np.sum(e1_U_core(eta) * weights, axis=0)
+        avg_e1_U = integral_e1 / avg_Q_1_L
+        E_mu, Q_mu = qber_cal(p_dark, P_AP, e_0, e_pol, n_s, channel, zenith, method='grid', nodes=nodes)
+    elif method == 'quad':
+        phi_mod, A_mod, eta_l, mu, sigma_R = prepare_cache.prepare(channel, zenith)
 
-    # Tích phân lấy trung bình Q1
-    avg_Q_1_L, _ = integrate.quad(Q_1_L, 0, np.inf, limit=100, epsabs=1e-9, epsrel=1e-9)
+        def Q_1_L(eta):
+            return Q_1_L_core(eta) * channel.f_eta(eta, phi_mod, A_mod, eta_l, mu, sigma_R)
 
-    # Tích phân lấy trung bình e1
-    integral_e1, _ = integrate.quad(e1_U, 0, np.inf, limit=100, epsabs=1e-9, epsrel=1e-9)
-    avg_e1_U = integral_e1 / avg_Q_1_L
+        def e1_U(eta):
+            return e1_U_core(eta) * channel.f_eta(eta, phi_mod, A_mod, eta_l, mu, sigma_R)
 
-    # Tính Qμ và Eμ trung bình
-    E_mu, Q_mu = qber_cal(p_dark, P_AP, e_0, e_pol, n_s, channel,zenith)
+        # Tích phân lấy trung bình Q1
+        avg_Q_1_L, _ = integrate.quad(Q_1_L, 0, np.inf, limit=100, epsabs=1e-9, epsrel=1e-9)
+
+        # Tích phân lấy trung bình e1
+        integral_e1, _ = integrate.quad(e1_U, 0, np.inf, limit=100, epsabs=1e-9, epsrel=1e-9)
+        avg_e1_U = integral_e1 / avg_Q_1_L
+
+        # Tính Qμ và Eμ trung bình
+        E_mu, Q_mu = qber_cal(p_dark, P_AP, e_0, e_pol, n_s, channel,zenith)
+    else:
+        raise ValueError(f"Unknown integration method: {method}")
 
     # Tính toàn bộ SKR
     element_1 = R * s * p * d
     element_2 = -Q_mu * f * H_2(E_mu)
     element_3 = avg_Q_1_L * (1 - H_2(avg_e1_U))
+    if np.ndim(element_3) > 0:
+        return element_1 * np.maximum(element_2 + element_3, 0)
     if (element_2 + element_3) < 0:
         return 0
     return element_1 * (element_2 + element_3)
 
 
-def simulation_QBer(params):
+def simulation_QBer(params, method='quad'):
     channel = AtmosphericChannel(tau_zen=params["tau"], H_source=500e3)
     qber, _ = qber_cal(
         params["p_dark"],
@@ -95,11 +181,12 @@ def simulation_QBer(params):
         params["e_0"],
         params["e_pol"],
         params["n_s"],channel,
-        params["zenith"]
+        params["zenith"],
+        method=method
     )
     return qber
 
-def simulation_SKR(params):
+def simulation_SKR(params, method='quad'):
     channel = AtmosphericChannel(tau_zen=params["tau"], H_source=500e3)
     skr = compute_SKR(
         params["R"],
@@ -113,6 +200,113 @@ def simulation_SKR(params):
         params["n_s"],
         params["n_d"],
         params["P_AP"],channel,
-        params["zenith"]
+        params["zenith"],
+        method=method
     )
     return skr
+
+
+def simulation_point(params, rng=None):
+    # Một điểm quét cho sweep_executor.run_sweep; công thức tất định nên không dùng rng
+    return simulation_QBer(params), simulation_SKR(params)
+
+
+# Các tham số có thể quét bằng sweep()
+SWEEP_PARAMS = ('zenith', 'tau', 'R', 's', 'p', 'd', 'f', 'p_dark', 'P_AP', 'e_0', 'e_pol', 'n_s', 'n_d')
+
+
+def sweep(params, n_nodes=GRID_NODES, **axes):
+    # Tính QBER và SKR trên cả lưới tham số trong một lần gọi (chế độ 'grid').
+    # Mỗi keyword là một mảng 1 chiều, ví dụ sweep(params, zenith=z, tau=t) trả về
+    # mảng shape (len(z), len(t)); các tham số còn lại lấy từ params.
+    for name in axes:
+        if name not in SWEEP_PARAMS:
+            raise ValueError(f"Cannot sweep parameter: {name}")
+
+    values = dict(params)
+    n_axes = len(axes)
+    for i, (name, axis) in enumerate(axes.items()):
+        shape = [1] * n_axes
+        shape[i] = -1
+        values[name] = np.asarray(axis, dtype=float).reshape(shape)
+    grid_shape = tuple(len(np.atleast_1d(axis)) for axis in axes.values())
+
+    # Một kênh cho cả lưới: tau chỉ vào qua eta_l nên broadcast được cùng zenith.
+    # Lưới nút có shape (n_nodes,) + grid_shape để mọi tham số quét đều broadcast được.
+    channel = AtmosphericChannel(tau_zen=values["tau"], H_source=500e3)
+    zenith = np.broadcast_to(values["zenith"], grid_shape)
+    nodes = pdf_nodes(channel, zenith, n_nodes)
+
+    qber, _ = qber_cal(values["p_dark"], values["P_AP"], values["e_0"], values["e_pol"], values["n_s"],
+                       channel, zenith, method='grid', nodes=nodes)
+    skr = compute_SKR(values["R"], values["s"], values["p"], values["d"], values["f"],
+                      values["p_dark"], values["e_0"], values["e_pol"], values["n_s"], values["n_d"],
+                      values["P_AP"], channel, zenith, method='grid', nodes=nodes)
+    return {
+        'qber': np.broadcast_to(qber, grid_shape).copy(),
+        'skr': np.broadcast_to(skr, grid_shape).copy(),
+        'axes': {name: np.asarray(axis, dtype=float) for name, axis in axes.items()},
+    }
+
+
+# Chế độ khoá hữu hạn. Các hàm dưới dấu tích phân của compute_SKR tuyến tính theo Q_nu, Q_mu
+# và E_nu_Q_nu, nên <Q_1_L> và <e1_U> tính thẳng được từ ba trung bình <Q_nu>, <Q_mu>, <EQ>
+# (một lần tính f_eta trên lưới). Với khối N xung (một lần bay qua của vệ tinh), các trung bình
+# này được thay bằng cận Hoeffding một phía ở mức eps_pe, theo hướng làm giảm khoá:
+# Q_nu xuống, Q_mu và EQ lên, QBER quan sát lên (mẫu ước lượng tham số N d s (1 - p) Q_mu bit).
+# Độ dài khoá trừ thêm 6 log2(21 / eps_sec) + log2(2 / eps_cor) cho bảo mật và đúng đắn.
+# N -> vô cùng thì SKR trùng với compute_SKR.
+FINITE_EPS_PE = 1e-10
+FINITE_EPS_SEC = 1e-10
+FINITE_EPS_COR = 1e-15
+
+
+def hoeffding(n, eps):
+    # Độ lệch tối đa của trung bình n mẫu trong [0, 1] với xác suất sai eps (một phía)
+    return np.sqrt(np.log(1 / eps) / (2 * n))
+
+
+def decoy_bounds(Q_mu, Q_nu, EQ, p_dark, P_AP, e_0, n_s, n_d):
+    # <Q_1_L> và <e1_U> của compute_SKR viết theo các trung bình
+    Y_0 = p_dark * (1 + P_AP)
+    Q_1_L = (np.exp(-n_s) * n_s ** 2) / (n_s * n_d - n_d ** 2) * (
+        Q_nu * np.exp(n_d) - Q_mu * np.exp(n_s) * (n_d ** 2 / n_s ** 2) - ((n_s ** 2 - n_d ** 2) / n_s ** 2) * Y_0)
+    e1_U = (EQ * np.exp(n_d) - e_0 * Y_0) * np.exp(-n_s) * n_s / (n_d * Q_1_L)
+    return Q_1_L, e1_U
+
+
+def compute_SKR_finite(R, s, p, d, f, p_dark, e_0, e_pol, n_s, n_d, P_AP, channel, zenith, block_size,
+                       eps_pe=FINITE_EPS_PE, eps_sec=FINITE_EPS_SEC, eps_cor=FINITE_EPS_COR, nodes=None):
+    # Trả về (SKR bit/s, độ dài khoá bit mỗi khối). block_size (số xung N) broadcast với zenith,
+    # vd block_size[:, None] và zenith 1 chiều cho mảng (len(block_size), len(zenith)).
+    eta, weights = nodes if nodes is not None else pdf_nodes(channel, zenith)
+    Q_mu = np.sum(Q_muy(eta, p_dark, P_AP, n_s) * weights, axis=0)
+    Q_nu = np.sum(Q_muy(eta, p_dark, P_AP, n_d) * weights, axis=0)
+    # như compute_SKR, E_nu_Q_nu tính bằng EQ_muy với n_s; được đo trên các xung decoy
+    EQ = np.sum(EQ_muy(eta, p_dark, P_AP, e_0, e_pol, n_s) * weights, axis=0)
+
+    N = np.asarray(block_size, dtype=float)
+    N_mu = N * d
+    N_nu = N * (1 - d)
+    Q_1_L, e1_U = decoy_bounds(Q_mu + hoeffding(N_mu, eps_pe), np.maximum(Q_nu - hoeffding(N_nu, eps_pe), 0),
+                               EQ + hoeffding(N_nu, eps_pe), p_dark, P_AP, e_0, n_s, n_d)
+    Q_1_L = np.maximum(Q_1_L, 0)
+    e1_U = np.clip(np.nan_to_num(e1_U, nan=0.5), 0, 0.5)
+    E_mu_U = np.minimum(EQ / Q_mu + hoeffding(N_mu * s * (1 - p) * Q_mu, eps_pe), 0.5)
+
+    bits_per_pulse = s * p * d * (Q_1_L * (1 - H_2(e1_U)) - Q_mu * f * H_2(E_mu_U))
+    key_length = np.maximum(N * bits_per_pulse - 6 * np.log2(21 / eps_sec) - np.log2(2 / eps_cor), 0)
+    return R * key_length / N, key_length
+
+
+def simulation_SKR_finite(params, block_size, zenith=None, n_nodes=GRID_NODES, **eps):
+    # SKR và độ dài khoá theo block_size x zenith trong một lần gọi: mảng shape
+    # (len(block_size), len(zenith)); zenith mặc định là params["zenith"].
+    zenith = np.atleast_1d(np.asarray(params["zenith"] if zenith is None else zenith, dtype=float))
+    block_size = np.atleast_1d(np.asarray(block_size, dtype=float))
+    channel = AtmosphericChannel(tau_zen=params["tau"], H_source=500e3)
+    skr, key_length = compute_SKR_finite(
+        params["R"], params["s"], params["p"], params["d"], params["f"], params["p_dark"], params["e_0"],
+        params["e_pol"], params["n_s"], params["n_d"], params["P_AP"], channel, zenith, block_size[:, None],
+        nodes=pdf_nodes(channel, zenith, n_nodes), **eps)
+    return {'skr': skr, 'key_length': key_length, 'block_size': block_size, 'zenith': zenith}
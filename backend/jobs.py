@@ -0,0 +1,185 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Hàng đợi job cho các mô phỏng chạy lâu: POST trả về job id ngay, job chạy trong pool
+# thread cục bộ, client hỏi trạng thái hoặc nghe tiến độ qua Server-Sent Events.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+
+
+class JobStoreFull(Exception):
+    # Store đã đủ maxsize job đang chờ/chạy: không bỏ job nào để nhận job mới
+    pass
+
+
+class MemoryJobStore:
+    # Lưu job trong bộ nhớ, giới hạn số job và xoá job đã xong quá ttl giây
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, job):
+        with self._lock:
+            if job['id'] not in self._jobs:
+                self._evict(room=1)
+                if len(self._jobs) >= self.maxsize:
+                    raise JobStoreFull(f"{len(self._jobs)} jobs queued or running")
+            self._jobs[job['id']] = dict(job)
+            self._jobs.move_to_end(job['id'])
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _evict(self, room=0):
+        # Chỉ bỏ job đã xong: quá ttl, rồi job cũ nhất cho tới khi còn chỗ cho room job mới.
+        # Job đang chờ/chạy không bao giờ bị bỏ (client sẽ nhận 404 cho job vẫn đang chạy).
+        now = time.time()
+        for job_id in [k for k, job in self._jobs.items()
+                       if job['status'] in (DONE, ERROR) and now - job['updated'] > self.ttl]:
+            del self._jobs[job_id]
+        finished = [k for k, job in self._jobs.items() if job['status'] in (DONE, ERROR)]
+        for job_id in finished[:max(0, len(self._jobs) + room - self.maxsize)]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    # Như MemoryJobStore nhưng lưu trong file SQLite để giữ job qua các lần khởi động lại.
+    # result phải chuyển được sang JSON (bytes được lưu dạng latin-1).
+    def __init__(self, path, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, updated REAL, body TEXT)")
+        self._db.commit()
+
+    @staticmethod
+    def _encode(job):
+        job = dict(job)
+        if isinstance(job.get('result'), bytes):
+            job['result'] = {'__bytes__': job['result'].decode('latin-1')}
+        return json.dumps(job)
+
+    @staticmethod
+    def _decode(body):
+        job = json.loads(body)
+        if isinstance(job.get('result'), dict) and '__bytes__' in job['result']:
+            job['result'] = job['result']['__bytes__'].encode('latin-1')
+        return job
+
+    def put(self, job):
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM jobs WHERE id = ?", (job['id'],)).fetchone() is None:
+                count = self._evict(room=1)
+                if count >= self.maxsize:
+                    self._db.commit()
+                    raise JobStoreFull(f"{count} jobs queued or running")
+            self._db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)",
+                             (job['id'], job['status'], job['updated'], self._encode(job)))
+            self._db.commit()
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            row = self._db.execute("SELECT body FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            job = self._decode(row[0])
+            job.update(fields, updated=time.time())
+            self._db.execute("UPDATE jobs SET status = ?, updated = ?, body = ? WHERE id = ?",
+                             (job['status'], job['updated'], self._encode(job), job_id))
+            self._db.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            self._db.commit()
+            row = self._db.execute("SELECT body FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._decode(row[0]) if row is not None else None
+
+    def _evict(self, room=0):
+        # Như MemoryJobStore._evict; trả về số job còn lại
+        self._db.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, ERROR, time.time() - self.ttl))
+        count = self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        excess = count + room - self.maxsize
+        if excess > 0:
+            count -= self._db.execute("DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN (?, ?) "
+                                      "ORDER BY updated LIMIT ?)", (DONE, ERROR, excess)).rowcount
+        return count
+
+
+class JobQueue:
+    def __init__(self, max_workers=2, store=None):
+        self.store = store if store is not None else MemoryJobStore()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+
+    def submit(self, kind, func, *args, **kwargs):
+        # func(*args, progress=..., **kwargs); progress(fraction, **info) cập nhật tiến độ 0..1.
+        # Raise JobStoreFull khi store đã đầy job chưa xong.
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        self.store.put({'id': job_id, 'kind': kind, 'status': QUEUED, 'progress': 0.0, 'info': {},
+                        'result': None, 'error': None, 'created': now, 'updated': now})
+        self._pool.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        self.store.update(job_id, status=RUNNING)
+
+        def progress(fraction, **info):
+            self.store.update(job_id, progress=float(fraction), info=info)
+
+        try:
+            result = func(*args, progress=progress, **kwargs)
+        except Exception as e:
+            self.store.update(job_id, status=ERROR, error=str(e))
+        else:
+            self.store.update(job_id, status=DONE, progress=1.0, result=result)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def status(self, job_id):
+        # Trạng thái không kèm result (result lấy riêng)
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        job.pop('result')
+        return job
+
+    def events(self, job_id, interval=0.5, timeout=3600):
+        # Sinh các sự kiện SSE mỗi khi trạng thái/tiến độ đổi, dừng khi job xong
+        last = None
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.status(job_id)
+            if job is None:
+                yield "event: error\ndata: {\"error\": \"Unknown job\"}\n\n"
+                return
+            state = (job['status'], job['progress'], json.dumps(job['info'], sort_keys=True))
+            if state != last:
+                last = state
+                yield f"data: {json.dumps(job)}\n\n"
+            if job['status'] in (DONE, ERROR):
+                return
+            time.sleep(interval)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
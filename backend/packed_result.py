@@ -0,0 +1,156 @@
+import base64
+import struct
+
+import numpy as np
+
+# Kết quả BB84 lưu dạng bit nén (np.packbits, 8 bit/byte) thay cho list int và None:
+# photon bị mất được đánh dấu bằng mask 'detected' thay vì None.
+FIELDS = ('alice_bits', 'alice_bases', 'bob_bases', 'bob_bits', 'detected')
+EVE_FIELDS = ('eve_bits', 'eve_bases', 'eve_detected')
+
+_MAGIC = b'BB84'
+_HEADER = struct.Struct('<4sQB')  # magic, số bit, có Eve hay không
+
+# Số bit 1 trong mỗi giá trị byte
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def pack(bits):
+    return np.packbits(np.asarray(bits, dtype=bool))
+
+
+def popcount(packed):
+    return int(_POPCOUNT[packed].sum(dtype=np.int64))
+
+
+class PackedResult:
+    def __init__(self, n, arrays):
+        # arrays: tên trường -> mảng uint8 đã nén, mỗi mảng dài ceil(n / 8) byte
+        self.n = n
+        self.arrays = arrays
+
+    @classmethod
+    def from_arrays(cls, alice_bits, alice_bases, bob_bases, bob_bits, detected,
+                    eve_bits=None, eve_bases=None, eve_detected=None):
+        # bob_bits của photon bị mất bị bỏ qua (coi như 0), chỉ có nghĩa khi detected = 1
+        arrays = {
+            'alice_bits': pack(alice_bits),
+            'alice_bases': pack(alice_bases),
+            'bob_bases': pack(bob_bases),
+            'bob_bits': pack(np.asarray(bob_bits) & np.asarray(detected, dtype=bool)),
+            'detected': pack(detected),
+        }
+        if eve_bases is not None:
+            arrays['eve_bits'] = pack(np.asarray(eve_bits) & np.asarray(eve_detected, dtype=bool))
+            arrays['eve_bases'] = pack(eve_bases)
+            arrays['eve_detected'] = pack(eve_detected)
+        return cls(len(alice_bits), arrays)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def has_eve(self):
+        return 'eve_bases' in self.arrays
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def unpack(self, name):
+        return np.unpackbits(self.arrays[name], count=self.n)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("PackedResult only supports slicing")
+        start, stop, step = index.indices(self.n)
+        if step == 1 and start % 8 == 0:
+            # cắt thẳng trên byte, chỉ cần xoá các bit thừa ở byte cuối
+            n = max(stop - start, 0)
+            arrays = {}
+            for name, packed in self.arrays.items():
+                chunk = packed[start // 8:(start + n + 7) // 8].copy()
+                if n % 8:
+                    chunk[-1] &= 0xFF << (8 - n % 8) & 0xFF
+                arrays[name] = chunk
+            return PackedResult(n, arrays)
+        arrays = {name: np.packbits(self.unpack(name)[index]) for name in self.arrays}
+        return PackedResult(len(range(start, stop, step)), arrays)
+
+    def matching(self):
+        # Mask nén của các photon Bob đo được và cùng basis với Alice
+        return ~(self.arrays['alice_bases'] ^ self.arrays['bob_bases']) & self.arrays['detected']
+
+    def error_mask(self):
+        return (self.arrays['alice_bits'] ^ self.arrays['bob_bits']) & self.matching()
+
+    @property
+    def matching_count(self):
+        return popcount(self.matching())
+
+    @property
+    def error_count(self):
+        return popcount(self.error_mask())
+
+    @property
+    def qber(self):
+        matches = self.matching_count
+        return self.error_count / matches if matches else 0
+
+    def sift(self):
+        # Khoá sift của Alice và Bob (nén), gồm mọi photon cùng basis kể cả bit lỗi
+        keep = np.unpackbits(self.matching(), count=self.n).astype(bool)
+        return (np.packbits(self.unpack('alice_bits')[keep]),
+                np.packbits(self.unpack('bob_bits')[keep]),
+                int(np.count_nonzero(keep)))
+
+    def as_lists(self):
+        # Dạng list giống response JSON cũ của /bb84 (None cho photon bị mất)
+        detected = self.unpack('detected').astype(bool)
+        alice_bits = self.unpack('alice_bits')
+        bob_bits = self.unpack('bob_bits')
+        correct = detected & (self.unpack('alice_bases') == self.unpack('bob_bases')) & (alice_bits == bob_bits)
+        lists = {
+            'alice_bits': alice_bits.tolist(),
+            'bob_bits': np.where(detected, bob_bits, None).tolist(),
+            'alice_bases': self.unpack('alice_bases').tolist(),
+            'bob_bases': self.unpack('bob_bases').tolist(),
+            'sifted_key': alice_bits[correct].astype(str).tolist(),
+        }
+        if self.has_eve:
+            lists['eve_bits'] = np.where(self.unpack('eve_detected').astype(bool), self.unpack('eve_bits'), None).tolist()
+            lists['eve_bases'] = self.unpack('eve_bases').tolist()
+        else:
+            lists['eve_bits'] = [0] * self.n
+            lists['eve_bases'] = [0] * self.n
+        return lists
+
+    def to_dict(self):
+        # Dạng JSON: mỗi trường là chuỗi base64 của mảng đã nén
+        data = {'n': self.n}
+        for name, packed in self.arrays.items():
+            data[name] = base64.b64encode(packed.tobytes()).decode('ascii')
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        n = int(data['n'])
+        names = FIELDS + (EVE_FIELDS if 'eve_bases' in data else ())
+        return cls(n, {name: np.frombuffer(base64.b64decode(data[name]), dtype=np.uint8).copy()
+                       for name in names})
+
+    def to_bytes(self):
+        names = FIELDS + (EVE_FIELDS if self.has_eve else ())
+        return _HEADER.pack(_MAGIC, self.n, self.has_eve) + b''.join(self.arrays[name].tobytes() for name in names)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, n, has_eve = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a packed BB84 result")
+        size = (n + 7) // 8
+        names = FIELDS + (EVE_FIELDS if has_eve else ())
+        if len(data) != _HEADER.size + size * len(names):
+            raise ValueError("Truncated packed BB84 result")
+        body = np.frombuffer(data, dtype=np.uint8, offset=_HEADER.size)
+        return cls(n, {name: body[i * size:(i + 1) * size].copy() for i, name in enumerate(names)})
@@ -5,6 +5,7 @@ from flask_cors import CORS
 import io
 import numpy as np
 import matplotlib.pyplot as plt
+import sweep_executor
 
 app = Flask(__name__)
 CORS(app)
@@ -132,6 +133,32 @@ def bb84_simulation():
         "combinedEfficiency": ce
     })
 
+def simulate_point(point, rng):
+    # Một điểm quét cho sweep_executor (chạy trong process con)
+    name_x, x, params, n_bits, source_generation_rate, cross_check_fraction = point
+    params = dict(params)
+    if name_x == 'Detection Efficiency':
+        params["detectorEfficiency"] = x / 100
+    elif name_x == 'Length':
+        params["fiberLength"] = x
+    elif name_x == 'Source Efficiency':
+        params["sourceEfficiency"] = x / 100
+    elif name_x == 'Sop Mean Deviation':
+        params["sopDeviation"] = x
+    elif name_x == 'Perturb Probability':
+        params["perturbProb"] = x / 100
+
+    _, _, _, _, _, qber, _ = Simu.bb84(n_bits, True, True, True, False, params, seed=rng)
+
+    ce = Simu.combined_efficiency_cal(params["sourceEfficiency"], params["fiberLength"],
+                                      params["detectorEfficiency"], params["fiberLoss"])
+    return (ce,
+            Simu.key_length_cal(n_bits, ce, cross_check_fraction),
+            Simu.key_rate_cal(source_generation_rate, ce, cross_check_fraction),
+            Simu.sifted_bit_rate(source_generation_rate, ce),
+            Simu.error_rate(source_generation_rate, ce, cross_check_fraction, qber),
+            qber * 100)
+
 @app.route('/plot_simulation', methods=['POST'])
 def plot_simulation():
     source_generation_rate = 72.6e6
@@ -163,12 +190,10 @@ def plot_simulation():
     point = data['point']
 
     step = (end - start) / point
-    xs, ces, kls, krs, sbrs, ers, qbers = [], [], [], [], [], [], []
-
-    for i in range(point):
-        x = start + step * i
-        xs.append(x)
-        # ... loop logic unchanged ...
+    xs = [start + step * i for i in range(point)]
+    points = [(name_x, x, params, n_bits, source_generation_rate, cross_check_fraction) for x in xs]
+    results = sweep_executor.run_sweep(simulate_point, points, seed=data.get('seed'))
+    ces, kls, krs, sbrs, ers, qbers = (list(column) for column in zip(*results))
 
     fig, ax = plt.subplots()
     ax.plot(xs, {
@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+from scipy import fft
+
+from formular import H_2
+from rng_streams import make_rng
+
+# Khuếch đại bảo mật bằng hàm băm Toeplitz. Ma trận Toeplitz m x n xác định bởi n + m - 1
+# bit seed (công khai): T[i, j] = seed[i - j + n - 1], nên T @ x là đoạn [n - 1, n + m - 1)
+# của tích chập seed * x, tính bằng FFT trong O(n log n) thay vì O(n m). Với n, m đến 10^6
+# giá trị tích chập nhỏ hơn 2^53 rất nhiều nên làm tròn float64 là chính xác.
+# Khoá lớn được chia thành khối PA_BLOCK_SIZE bit, mỗi khối băm với seed riêng; các khối cùng
+# độ dài chạy chung một lần rfft 2 chiều.
+PA_BLOCK_SIZE = 1 << 20
+PA_BATCH_BYTES = 256 * 1024 * 1024
+
+
+def secret_length(n, qber, leaked_bits=None, f=1.16, eps_pa=1e-10):
+    # Độ dài khoá cuối: n (1 - H_2(e)) - bit lộ khi sửa lỗi - 2 log2(1 / eps_pa).
+    # leaked_bits lấy từ reconciliation.cascade; None thì ước lượng f n H_2(e).
+    if leaked_bits is None:
+        leaked_bits = f * n * H_2(qber)
+    return max(0, int(np.floor(n * (1 - H_2(qber)) - leaked_bits - 2 * np.log2(1 / eps_pa))))
+
+
+def toeplitz_hash(blocks, m, seeds):
+    # blocks: mảng bit shape (k, n), seeds: shape (k, n + m - 1). Trả về (k, m) bit.
+    blocks = np.atleast_2d(blocks)
+    seeds = np.atleast_2d(seeds)
+    n = blocks.shape[1]
+    if m == 0 or n == 0:
+        return np.zeros((len(blocks), m), dtype=np.uint8)
+    size = fft.next_fast_len(n + m - 1, real=True)
+    spectrum = fft.rfft(seeds.astype(np.float64), size, axis=1, workers=-1)
+    spectrum *= fft.rfft(blocks.astype(np.float64), size, axis=1, workers=-1)
+    conv = fft.irfft(spectrum, size, axis=1, workers=-1)[:, n - 1:n + m - 1]
+    return (np.rint(conv).astype(np.int64) & 1).astype(np.uint8)
+
+
+def privacy_amplification(key, qber, leaked_bits=None, f=1.16, eps_pa=1e-10, block_size=PA_BLOCK_SIZE,
+                          rng=None):
+    # key: khoá đã sửa lỗi (mảng bit). Mỗi khối dài n_i được nén còn secret_length(n_i, ...)
+    # bit, bit lộ chia cho các khối theo độ dài.
+    start = time.perf_counter()
+    rng = make_rng(rng)
+    key = np.asarray(key, dtype=np.uint8)
+    n = len(key)
+    if leaked_bits is None:
+        leaked_bits = f * n * H_2(qber)
+
+    full, rest = divmod(n, block_size)
+    groups = [(key[:full * block_size].reshape(full, block_size), block_size)] if full else []
+    if rest:
+        groups.append((key[full * block_size:].reshape(1, rest), rest))
+
+    out = []
+    for blocks, size in groups:
+        m = secret_length(size, qber, leaked_bits * size / n, eps_pa=eps_pa)
+        if m == 0:
+            continue
+        # giới hạn bộ nhớ của phổ FFT (complex128) cho mỗi lần chạy
+        batch = max(1, PA_BATCH_BYTES // (16 * (size + m)))
+        for i in range(0, len(blocks), batch):
+            chunk = blocks[i:i + batch]
+            seeds = rng.integers(0, 2, (len(chunk), size + m - 1), dtype=np.uint8)
+            out.append(toeplitz_hash(chunk, m, seeds).ravel())
+
+    final_key = np.concatenate(out) if out else np.zeros(0, dtype=np.uint8)
+    seconds = time.perf_counter() - start
+    return {
+        'key': final_key,
+        'n': n,
+        'length': len(final_key),
+        'blocks': full + (1 if rest else 0),
+        'qber': qber,
+        'leaked_bits': leaked_bits,
+        'seconds': seconds,
+        'throughput_mbps': n / seconds / 1e6 if seconds else 0.0,
+    }
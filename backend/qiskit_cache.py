@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+
+# Cache dùng chung trong process cho các đối tượng Qiskit tốn công tạo: backend Aer, mạch đã
+# transpile (theo cấu trúc cổng, góc thay bằng tham số) và toán tử hằng. Qiskit chỉ được
+# import khi thật sự cần tạo đối tượng.
+
+
+class ObjectCache:
+    # LRU cache khoá -> đối tượng, an toàn giữa các thread, có đếm hit/miss
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Tạo ngoài lock (transpile có thể mất vài chục ms); hai thread cùng miss thì
+        # giữ bản được lưu trước để mọi nơi dùng chung một đối tượng
+        value = factory()
+        with self._lock:
+            value = self._entries.setdefault(key, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+backends = ObjectCache(maxsize=16)
+transpiled = ObjectCache(maxsize=256)
+operators = ObjectCache(maxsize=64)
+
+
+def get_backend(name='aer_simulator', **options):
+    # Aer.get_backend(name), hoặc AerSimulator(**options) nếu có options (vd method=...)
+    def create():
+        if options:
+            from qiskit_aer import AerSimulator
+            return AerSimulator(**options)
+        from qiskit_aer import Aer
+        return Aer.get_backend(name)
+
+    return backends.get((name,) + tuple(sorted(options.items())), create)
+
+
+def _structure(qc):
+    # Dãy cổng (tên, chỉ số qubit, chỉ số clbit, số tham số), không gồm giá trị góc
+    return tuple((instr.operation.name,
+                  tuple(qc.find_bit(q).index for q in instr.qubits),
+                  tuple(qc.find_bit(c).index for c in instr.clbits),
+                  len(instr.operation.params))
+                 for instr in qc.data)
+
+
+def transpile(qc, backend):
+    # Như qiskit.transpile(qc, backend) cho một mạch, nhưng mạch cùng cấu trúc (vd 8 biến thể
+    # bit x basis x có nhiễu RY) chỉ transpile một lần: góc được thay bằng tham số rồi gán lại.
+    angles = [float(p) for instr in qc.data for p in instr.operation.params]
+
+    def create():
+        from qiskit import QuantumCircuit
+        from qiskit import transpile as qiskit_transpile
+        from qiskit.circuit import ParameterVector
+        theta = ParameterVector('theta', len(angles))
+        template = QuantumCircuit(qc.num_qubits, qc.num_clbits)
+        k = 0
+        for instr in qc.data:
+            op = instr.operation
+            if op.params:
+                op = op.copy()
+                op.params = list(theta[k:k + len(op.params)])
+                k += len(op.params)
+            template.append(op, [qc.find_bit(q).index for q in instr.qubits],
+                            [qc.find_bit(c).index for c in instr.clbits])
+        return qiskit_transpile(template, backend), theta
+
+    template, theta = transpiled.get((backend, qc.num_qubits, qc.num_clbits, _structure(qc)), create)
+    if not angles:
+        return template
+    return template.assign_parameters(dict(zip(theta, angles)))
+
+
+def operator(label):
+    # Toán tử hằng, vd operator('H')
+    def create():
+        from qiskit.quantum_info import Operator
+        return Operator.from_label(label)
+
+    return operators.get(label, create)
+
+
+def cached(key, factory):
+    # Đối tượng Qiskit bất kỳ dựng từ factory(), dùng chung cache với mạch đã transpile
+    return transpiled.get(key, factory)
+
+
+def stats():
+    return {'backends': backends.stats(), 'transpiled': transpiled.stats(), 'operators': operators.stats()}
+
+
+def clear():
+    backends.clear()
+    transpiled.clear()
+    operators.clear()
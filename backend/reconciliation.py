@@ -0,0 +1,118 @@
+import time
+
+import numpy as np
+
+from formular import H_2
+from rng_streams import make_rng
+
+# Sửa lỗi khoá sift bằng Cascade. Mọi khối của một pass được xử lý cùng lúc: parity các
+# khối bằng np.add.reduceat, tìm kiếm nhị phân chạy song song trên mọi khối lẻ bằng prefix
+# parity (XOR cộng dồn), mỗi vòng chia đôi toàn bộ các khoảng đang tìm.
+# Parity Alice công bố so với parity của Bob chính là parity của vector lỗi e = a ^ b trên
+# cùng đoạn, nên mô phỏng làm việc thẳng trên e; mỗi parity trao đổi tính là 1 bit lộ.
+CASCADE_PASSES = 4
+
+
+class _Pass:
+    # Một pass: hoán vị (công khai), kích thước khối và parity lỗi hiện tại của từng khối
+    def __init__(self, perm, block_size, errors):
+        self.perm = perm
+        self.inverse = None
+        if perm is not None:
+            self.inverse = np.empty_like(perm)
+            self.inverse[perm] = np.arange(len(perm))
+        self.block_size = block_size
+        self.starts = np.arange(0, len(errors), block_size)
+        self.parity = np.add.reduceat(self.permuted(errors), self.starts) & 1
+
+    def permuted(self, errors):
+        return errors if self.perm is None else errors[self.perm]
+
+    def position(self, index):
+        # vị trí trong khoá gốc của phần tử thứ index theo thứ tự của pass
+        return index if self.perm is None else self.perm[index]
+
+    def flip(self, positions):
+        # Bob vừa sửa các bit positions: đảo parity của các khối chứa chúng
+        index = positions if self.inverse is None else self.inverse[positions]
+        hits = np.bincount(index // self.block_size, minlength=len(self.parity))
+        self.parity ^= (hits & 1).astype(self.parity.dtype)
+
+
+def _binary_search(p, errors, blocks):
+    # Tìm một bit lỗi trong mỗi khối lẻ, mọi khối cùng lúc. Trả về (vị trí, số bit lộ)
+    n = len(errors)
+    prefix = np.concatenate(([0], np.bitwise_xor.accumulate(p.permuted(errors))))
+    lo = blocks * p.block_size
+    hi = np.minimum(lo + p.block_size, n)
+    leaked = 0
+    active = hi - lo > 1
+    while active.any():
+        mid = (lo + hi) // 2
+        left_odd = (prefix[mid] ^ prefix[lo]).astype(bool)
+        leaked += int(np.count_nonzero(active))
+        hi = np.where(active & left_odd, mid, hi)
+        lo = np.where(active & ~left_odd, mid, lo)
+        active = hi - lo > 1
+    return p.position(lo), leaked
+
+
+def cascade(alice_key, bob_key, qber=None, passes=CASCADE_PASSES, rng=None):
+    # alice_key, bob_key: mảng bit (0/1) cùng độ dài. qber: QBER ước lượng (vd từ
+    # calculate_qber_sample) để chọn khối đầu k1 = 0.73 / qber; None thì dùng tỉ lệ lỗi thật.
+    # Khối nhân đôi sau mỗi pass, pass 2 trở đi dùng hoán vị ngẫu nhiên chung của hai bên.
+    start = time.perf_counter()
+    rng = make_rng(rng)
+    alice_key = np.asarray(alice_key, dtype=np.uint8)
+    errors = alice_key ^ np.asarray(bob_key, dtype=np.uint8)
+    n = len(errors)
+    initial_errors = int(np.count_nonzero(errors))
+    if qber is None:
+        qber = initial_errors / n if n else 0
+    block_size = max(4, int(0.73 / qber)) if qber > 0 else max(n, 1)
+
+    leaked = 0
+    done = []
+    for i in range(passes if n else 0):
+        p = _Pass(None if i == 0 else rng.permutation(n), min(block_size << i, max(n, 1)), errors)
+        leaked += len(p.parity)
+        done.append(p)
+        # Mỗi bit sửa làm lẻ các khối chứa nó ở các pass trước: lặp cho tới khi mọi khối chẵn
+        found = True
+        while found:
+            found = False
+            for q in [p] + done[:-1]:
+                blocks = np.flatnonzero(q.parity)
+                if len(blocks) == 0:
+                    continue
+                found = True
+                positions, search_leaked = _binary_search(q, errors, blocks)
+                leaked += search_leaked
+                errors[positions] ^= 1
+                for r in done:
+                    r.flip(positions)
+
+    seconds = time.perf_counter() - start
+    error_rate = initial_errors / n if n else 0
+    shannon = n * H_2(error_rate)
+    return {
+        # khoá của Bob sau khi sửa (bằng khoá Alice nếu residual_errors = 0)
+        'key': alice_key ^ errors,
+        'n': n,
+        'initial_errors': initial_errors,
+        'residual_errors': int(np.count_nonzero(errors)),
+        'leaked_bits': leaked,
+        # f = bit lộ / giới hạn Shannon n * H_2(e); Cascade thường đạt khoảng 1.1-1.2.
+        # None khi khoá không có lỗi (giới hạn Shannon bằng 0, f không xác định)
+        'efficiency': leaked / shannon if shannon else None,
+        'passes': len(done),
+        'first_block_size': block_size,
+        'seconds': seconds,
+        'throughput_mbps': n / seconds / 1e6 if seconds else 0.0,
+    }
+
+
+def cascade_packed(result, qber=None, passes=CASCADE_PASSES, rng=None):
+    # Chạy Cascade trên khoá sift (gồm cả bit lỗi) của một PackedResult
+    alice_packed, bob_packed, n = result.sift()
+    return cascade(np.unpackbits(alice_packed, count=n), np.unpackbits(bob_packed, count=n), qber, passes, rng)
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+def normalize(endpoint, data):
+    # Khoá cache: tên endpoint + tham số request đã chuẩn hoá (số về float, bỏ chuỗi rỗng,
+    # sắp xếp key) để "30", 30 và 30.0 trúng cùng một entry
+    def clean(value):
+        if isinstance(value, bool) or value is None:
+            return value
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return value.strip()
+        if isinstance(value, (list, tuple)):
+            return [clean(v) for v in value]
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items() if v not in (None, '')}
+        return value
+
+    return endpoint + ':' + json.dumps(clean(data or {}), sort_keys=True)
+
+
+class ResponseCache:
+    # LRU cache cho response của các endpoint tất định (số liệu JSON hoặc ảnh PNG).
+    # Giới hạn cả số entry lẫn tổng số byte; mỗi entry có ETag để trả 304.
+    def __init__(self, maxsize=512, max_bytes=64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        # (etag, body, mimetype) hoặc None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, body, mimetype):
+        etag = hashlib.sha1(body).hexdigest()
+        entry = (etag, body, mimetype)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= len(self._entries[key][1])
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.nbytes += len(body)
+            while len(self._entries) > self.maxsize or self.nbytes > self.max_bytes:
+                _, (_, old, _) = self._entries.popitem(last=False)
+                self.nbytes -= len(old)
+        return entry
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'not_modified': self.not_modified,
+                    'hit_rate': self.hits / total if total else 0.0,
+                    'size': len(self._entries), 'maxsize': self.maxsize,
+                    'bytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.not_modified = 0
@@ -0,0 +1,30 @@
+import numpy as np
+
+
+def make_rng(seed=None):
+    # seed: None, số nguyên, SeedSequence hoặc một Generator có sẵn (dùng lại nguyên vẹn)
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+
+def spawn(seed, n):
+    # n Generator con độc lập cho chạy theo chunk hoặc song song. Với cùng seed, luồng
+    # thứ i luôn giống nhau nên kết quả không phụ thuộc cách chia việc.
+    if isinstance(seed, np.random.Generator):
+        return seed.spawn(n)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(n)]
+
+
+def stream(seed):
+    # Dãy Generator con vô hạn, lấy dần từng cái (cho mô phỏng theo chunk không biết trước số chunk).
+    # Phần tử thứ i giống spawn(seed, n)[i].
+    if isinstance(seed, np.random.Generator):
+        while True:
+            yield seed.spawn(1)[0]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    while True:
+        yield np.random.default_rng(seed.spawn(1)[0])
@@ -1,7 +1,6 @@
 import sys
 import numpy as np
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import Aer
+import bb84_core as core
 
 
 def setup_parameters(params):
@@ -16,144 +15,38 @@ def setup_parameters(params):
     }
 
 
-def photon_survives(fiber_length, fiber_loss, source_efficiency, detector_efficiency):
-    total_loss_dB = fiber_length * fiber_loss
-    prob_transmission = source_efficiency * 10 ** (-total_loss_dB / 10) * detector_efficiency
-    return np.random.rand() < prob_transmission
-
-
-def apply_perturbation(qc, q, perturb_probability):
-    if np.random.rand() < perturb_probability:
-        theta = np.random.uniform(0, np.pi)
-        qc.ry(theta, q)
-
-
-def apply_sop_deviation(qc, q, sigma_sop):
-    theta = np.random.normal(0, sigma_sop)
-    qc.ry(theta, q)
-
-
-def prepare_qubit(bit, basis):
-    qc = QuantumCircuit(1, 1)
-    if basis == 0:
-        if bit == 1:
-            qc.x(0)
-    else:
-        if bit == 1:
-            qc.x(0)
-        qc.h(0)
-    return qc
-
-
-def transmit(qc, fiber_length, fiber_loss, source_efficiency, detector_efficiency, perturb_probability, sigma_sop):
-    if not photon_survives(fiber_length, fiber_loss, source_efficiency, detector_efficiency):
-        return None
-    apply_perturbation(qc, 0, perturb_probability)
-    apply_sop_deviation(qc, 0, sigma_sop)
-    return qc
-
-
-def measure_qubit(qc, basis):
-    if basis == 1:
-        qc.h(0)
-    qc.measure(0, 0)
-    simulator = Aer.get_backend('aer_simulator')
-    compiled = transpile(qc, simulator)
-    job = simulator.run(compiled, shots=1, memory=True)
-    res = job.result().get_memory()[0]
-    return int(res)
+def channels(params):
+    return [
+        core.FiberLoss(params['fiber_length'], params['fiber_loss'],
+                       params['source_efficiency'], params['detector_efficiency']),
+        core.Perturbation(params['perturb_probability']),
+        core.SOPDeviation(params['sigma_sop']),
+    ]
 
 
 def calculate_qber(alice_bits, bob_bits, alice_bases, bob_bases):
-    matching_bits = []
-    for a_bit, b_bit, a_base, b_base in zip(alice_bits, bob_bits, alice_bases, bob_bases):
-        if a_base == b_base and b_bit is not None:
-            matching_bits.append((a_bit, b_bit))
-
-    if not matching_bits:
-        return 0
-    num_errors = sum(1 for a_bit, b_bit in matching_bits if a_bit != b_bit)
-    return num_errors / len(matching_bits)
+    return core.calculate_qber_sample(alice_bits, bob_bits, alice_bases, bob_bases, sample_fraction=1)
 
 
-def bb84_no_Eve(n_bits=1000, params=None):
+def _run(n_bits, params, eve, seed):
+    # Chạy trên Aer như bản gốc; Eve đo sau kênh và gửi lại trực tiếp cho Bob
     if params is None:
         params = setup_parameters({})
+    run = core.simulate(n_bits, channels(params), core.InterceptResend() if eve else None, 'aer', seed)
+    matching, correct = core.sift(run)
+    sifted_key = run.alice_bits[correct].astype(str).tolist()
+    bob_bits = core.bob_bits_list(run)
+    qber = calculate_qber(run.alice_bits, bob_bits, run.alice_bases, run.bob_bases)
+    return (run.alice_bits.tolist(), bob_bits, run.alice_bases.tolist(), run.bob_bases.tolist(), sifted_key, qber,
+            int(np.count_nonzero(matching)))
 
-    alice_bits = np.random.randint(0, 2, n_bits)
-    alice_bases = np.random.randint(0, 2, n_bits)
-    bob_bases = np.random.randint(0, 2, n_bits)
-
-    raw_key = []
-    bob_bits = []
-    matching_bases_count = 0
-
-    for bit, a_basis, b_basis in zip(alice_bits, alice_bases, bob_bases):
-        qc = prepare_qubit(bit, a_basis)
-        qc_channel = transmit(
-            qc,
-            params['fiber_length'], params['fiber_loss'],
-            params['source_efficiency'], params['detector_efficiency'],
-            params['perturb_probability'], params['sigma_sop']
-        )
-        if qc_channel is None:
-            raw_key.append((a_basis, b_basis, bit, None))
-            bob_bits.append(None)
-            continue
-        result = measure_qubit(qc_channel, b_basis)
-        raw_key.append((a_basis, b_basis, bit, result))
-        bob_bits.append(result)
-        if a_basis == b_basis:
-            matching_bases_count += 1
-
-    sifted_key = [str(bit) for a, b, bit, res in raw_key if res is not None and a == b and bit == res]
-    qber = calculate_qber(alice_bits.tolist(), bob_bits, alice_bases.tolist(), bob_bases.tolist())
-
-    return alice_bits.tolist(), bob_bits, alice_bases.tolist(), bob_bases.tolist(), sifted_key, qber, matching_bases_count
-
-
-def bb84_Eve(n_bits=1000, params=None):
-    if params is None:
-        params = setup_parameters({})
-
-    alice_bits = np.random.randint(0, 2, n_bits)
-    alice_bases = np.random.randint(0, 2, n_bits)
-    eve_bases = np.random.randint(0, 2, n_bits)
-    bob_bases = np.random.randint(0, 2, n_bits)
-
-    raw_key = []
-    bob_bits = []
-    eve_bits = []
-    matching_bases_count = 0
-
-    for bit, a_basis, eve_basis, b_basis in zip(alice_bits, alice_bases, eve_bases, bob_bases):
-        qc = prepare_qubit(bit, a_basis)
-        qc_channel = transmit(
-            qc,
-            params['fiber_length'], params['fiber_loss'],
-            params['source_efficiency'], params['detector_efficiency'],
-            params['perturb_probability'], params['sigma_sop']
-        )
-        if qc_channel is None:
-            raw_key.append((a_basis, b_basis, bit, None))
-            bob_bits.append(None)
-            eve_bits.append(None)
-            continue
-
-        pre_result = measure_qubit(qc_channel, eve_basis)
-        eve_bits.append(pre_result)
-        qc_channel = prepare_qubit(pre_result, eve_basis)
 
-        result = measure_qubit(qc_channel, b_basis)
-        raw_key.append((a_basis, b_basis, bit, result))
-        bob_bits.append(result)
-        if a_basis == b_basis:
-            matching_bases_count += 1
+def bb84_no_Eve(n_bits=1000, params=None, seed=None):
+    return _run(n_bits, params, False, seed)
 
-    sifted_key = [str(bit) for a, b, bit, res in raw_key if res is not None and a == b and bit == res]
-    qber = calculate_qber(alice_bits.tolist(), bob_bits, alice_bases.tolist(), bob_bases.tolist())
 
-    return alice_bits.tolist(), bob_bits, alice_bases.tolist(), bob_bases.tolist(), sifted_key, qber, matching_bases_count
+def bb84_Eve(n_bits=1000, params=None, seed=None):
+    return _run(n_bits, params, True, seed)
 
 
 if __name__ == '__main__':
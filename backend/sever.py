@@ -1,20 +1,53 @@
+import os
+# Server không có màn hình: matplotlib luôn dùng backend Agg (đặt trước mọi import matplotlib)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
 from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 import io
+import json
+import sys
+import threading
 import numpy as np
-import matplotlib.pyplot as plt
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import Aer
 import bb84
-import bb84_fso as Simu
-import formular
+import sweep_executor
+import jobs
+import circuit_svg
+import qiskit_cache
 app = Flask(__name__)
 CORS(app)
 
 from bb84 import setup_parameters
+from rng_streams import make_rng
+from packed_result import popcount
+from response_cache import ResponseCache, normalize
+
+try:
+    import msgpack
+except ImportError:  # msgpack là tuỳ chọn, chỉ cần cho format 'msgpack'
+    msgpack = None
+
+def json_values(values):
+    # Mảng/số -> list/float cho JSON. JSON không có NaN/inf nên giá trị không hữu hạn thành null
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isfinite(values), values, None).tolist()
+
 
-def build_full_circuit(alice_bits, alice_bases, bob_bases, perturbProbability, eve_bases=None):
+def circuit_perturbations(n, perturbProbability, rng=None):
+    # Góc RY cho từng qubit (None nếu không bị nhiễu), dùng chung cho cả hai cách vẽ mạch
+    rng = make_rng(rng)
+    angles = []
+    for i in range(n):
+        angles.append(rng.uniform(0, np.pi) if rng.random() < perturbProbability else None)
+    return angles
+
+
+def build_full_circuit(alice_bits, alice_bases, bob_bases, perturbProbability, eve_bases=None, rng=None,
+                       ry_angles=None):
+    from qiskit import QuantumCircuit
     n = len(alice_bits)
+    if ry_angles is None:
+        ry_angles = circuit_perturbations(n, perturbProbability, rng)
     qc = QuantumCircuit(n, n)
 
     for i in range(n):
@@ -36,9 +69,8 @@ def build_full_circuit(alice_bits, alice_bases, bob_bases, perturbProbability, e
                 qc.h(i)
         qc.barrier()
 
-    for i in range(n):
-        if np.random.rand() < perturbProbability:
-            theta = np.random.uniform(0, np.pi)
+    for i, theta in enumerate(ry_angles):
+        if theta is not None:
             qc.ry(theta, i)
 
     for i in range(n):
@@ -53,21 +85,81 @@ def build_full_circuit(alice_bits, alice_bases, bob_bases, perturbProbability, e
     return qc
 
 
+# Định dạng response của /bb84: 'json' (list như cũ), 'packed' (JSON base64 bit nén),
+# 'msgpack', 'binary' (application/octet-stream) hoặc 'summary' (chỉ số liệu, có phân trang)
+BB84_FORMATS = {
+    'application/json': 'json',
+    'application/x-msgpack': 'msgpack',
+    'application/msgpack': 'msgpack',
+    'application/octet-stream': 'binary',
+}
+
+
+def bb84_response_format(data):
+    fmt = data.get('format')
+    if fmt is None:
+        fmt = request.accept_mimetypes.best_match(list(BB84_FORMATS), default='application/json')
+        fmt = BB84_FORMATS[fmt]
+    if fmt not in ('json', 'packed', 'msgpack', 'binary', 'summary'):
+        raise ValueError(f"Unknown format: {fmt}")
+    if fmt == 'msgpack' and msgpack is None:
+        raise ValueError("msgpack is not installed on the server")
+    return fmt
+
+
+def bb84_summary(result):
+    matching = result.matching_count
+    errors = result.error_count
+    return {
+        'bit_count': result.n,
+        'detections': popcount(result.arrays['detected']),
+        'matching_bases_count': matching,
+        'error_count': errors,
+        'sifted_key_length': matching - errors,
+        'quantum_bit_error_rate': errors / matching if matching else 0,
+    }
+
+
 @app.route('/bb84', methods=['POST'])
 def bb84_api():
     data = request.get_json()
     try:
         n_bits = int(data.get('bitCount', 100))
         isEveMode = data.get('isEveMode', False)
-
-        params = {k: v for k, v in data.items() if k not in ('bitCount', 'isEveMode', 'isNoEveMode')}
+        engine = data.get('engine', 'numpy')
+        seed = data.get('seed')
+        fmt = bb84_response_format(data)
+
+        params = {k: v for k, v in data.items()
+                  if k not in ('bitCount', 'isEveMode', 'isNoEveMode', 'engine', 'seed', 'format', 'offset', 'limit')}
+
+        if fmt != 'json':
+            if engine != 'numpy':
+                raise ValueError(f"Format '{fmt}' requires engine 'numpy'")
+            result = bb84.bb84_packed(n_bits=n_bits, params=setup_parameters(params), eve=isEveMode, seed=seed)
+            summary = bb84_summary(result)
+            if fmt == 'binary':
+                headers = {f"X-BB84-{k.replace('_', '-')}": str(v) for k, v in summary.items()}
+                return Response(result.to_bytes(), mimetype='application/octet-stream', headers=headers)
+            if fmt == 'msgpack':
+                body = {**summary, **{name: packed.tobytes() for name, packed in result.arrays.items()}}
+                return Response(msgpack.packb(body), mimetype='application/x-msgpack')
+            if fmt == 'packed':
+                return jsonify({**summary, **result.to_dict()})
+            # summary: kèm một trang list từng qubit nếu có 'limit'
+            if data.get('limit') is not None:
+                offset = int(data.get('offset', 0))
+                limit = int(data['limit'])
+                summary['page'] = {'offset': offset, 'limit': limit,
+                                   **result[offset:offset + limit].as_lists()}
+            return jsonify(summary)
 
         if isEveMode:
             alice_bits, bob_bits, alice_bases, bob_bases, eve_bits, eve_bases, sifted_key, qber, matching = \
-                bb84.bb84_Eve(n_bits=n_bits, params=setup_parameters(params))
+                bb84.bb84_Eve(n_bits=n_bits, params=setup_parameters(params), engine=engine, seed=seed)
         else:
             alice_bits, bob_bits, alice_bases, bob_bases, _, _, sifted_key, qber, matching = \
-                bb84.bb84_no_Eve(n_bits=n_bits, params=setup_parameters(params))
+                bb84.bb84_no_Eve(n_bits=n_bits, params=setup_parameters(params), engine=engine, seed=seed)
             eve_bits = [0] * n_bits
             eve_bases = [0] * n_bits
 
@@ -92,7 +184,9 @@ def bb84_api():
 def bb84_circuit():
     data = request.get_json()
     try:
-        mein_num = 20
+        # 'svg' (mặc định): vẽ SVG trực tiếp, nhanh và được nhớ đệm; 'qiskit': drawer matplotlib của Qiskit
+        renderer = data.get('renderer', 'svg')
+        mein_num = 20 if renderer == 'qiskit' else 64
         alice_bits = data['alice_bits'][:mein_num]
         alice_bases = data['alice_bases'][:mein_num]
         bob_bases = data['bob_bases'][:mein_num]
@@ -102,14 +196,23 @@ def bb84_circuit():
         if eve_bases is not None:
             eve_bases = eve_bases[:mein_num]
 
+        ry_angles = circuit_perturbations(len(alice_bits), perturbProbability, data.get('seed'))
+        if renderer == 'svg':
+            svg = circuit_svg.render_svg(alice_bits, alice_bases, bob_bases, eve_bases, ry_angles)
+            return Response(svg, mimetype='image/svg+xml')
+        if renderer != 'qiskit':
+            raise ValueError(f"Unknown renderer: {renderer}")
+
         qc = build_full_circuit(
             alice_bits,
             alice_bases,
             bob_bases,
             perturbProbability,
-            eve_bases=eve_bases
+            eve_bases=eve_bases,
+            ry_angles=ry_angles
         )
 
+        from qiskit import QuantumCircuit
         qc_clean = QuantumCircuit(qc.num_qubits, qc.num_clbits)
         for instr, qargs, cargs in qc.data:
             qc_clean.append(instr, qargs, cargs)
@@ -137,12 +240,47 @@ def bb84_circuit():
 
 from flask import request, jsonify
 
+# Response của /bb84_simu và /plot_simulation chỉ phụ thuộc tham số nên được cache lại
+response_cache = ResponseCache()
+
+
+def cached_response(endpoint, data, compute):
+    # compute() -> (body bytes, mimetype); hỗ trợ ETag / If-None-Match (304)
+    key = normalize(endpoint, data)
+    entry = response_cache.get(key)
+    if entry is None:
+        entry = response_cache.put(key, *compute())
+    etag, body, mimetype = entry
+    if request.if_none_match.contains(etag):
+        response_cache.record_not_modified()
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    return response
+
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    # formular (scipy) chỉ được import khi có endpoint dùng tới, không ép import ở đây
+    formular = sys.modules.get('formular')
+    return jsonify({'responses': response_cache.stats(),
+                    'prepare': formular.prepare_cache.stats() if formular else None,
+                    'prepare_log': formular.log_prepare_cache.stats() if formular else None,
+                    'circuit_svg': circuit_svg.cache_stats(),
+                    'qiskit': qiskit_cache.stats()})
+
+
 @app.route('/bb84_simu', methods=['POST'])
 def bb84_simu():
     data = request.get_json()
+    return cached_response('bb84_simu', data,
+                           lambda: (json.dumps(bb84_simu_result(data)).encode(), 'application/json'))
 
+
+def simu_params(data):
     # Lấy và xử lý dữ liệu đầu vào an toàn
-    params = {
+    return {
         'R':       float(data['R']) *1e6     if data.get('R')      not in [None, ''] else 1e9,
         's':       float(data['s'])      if data.get('s')      not in [None, ''] else 0.5,
         'p':       float(data['p'])      if data.get('p')      not in [None, ''] else 0.75,
@@ -159,6 +297,11 @@ def bb84_simu():
 
     }
 
+
+def bb84_simu_result(data):
+    import formular
+    params = simu_params(data)
+
     # Tính QBER và SKR
     qber_val = formular.simulation_QBer(
          params
@@ -170,110 +313,272 @@ def bb84_simu():
     print(f"skr{skr_val}")
     print(f"qber{qber_val}")
     # Trả về kết quả
-    return jsonify({
-        'qber': qber_val * 100,
-        'siftedkey': skr_val/1e6
-    })
+    return {
+        'qber': json_values(qber_val * 100),
+        'siftedkey': json_values(skr_val/1e6)
+    }
+
+
+def render_plot_simulation(data, progress=None):
+    # Vẽ QBER/SKR theo một tham số, trả về ảnh PNG (bytes). Dùng chung cho /plot_simulation và job.
+    import formular
+    import matplotlib.pyplot as plt
+    params = {
+        'R': 1e9,
+        's': 0.5,
+        'p': 0.75,
+        'f': 1.0,
+        'd': 0.5,
+        'p_dark': 1e-4,
+        'P_AP': 0.02,
+        'e_0': 0.5,
+        'e_pol': 0.01,
+        'n_s': 0.3,
+        'n_d': 0.09,
+        'zenith': 30,
+        'tau': 0.81
+    }
+
+    name_x = data['name_x']              # e.g. "Zenith"
+    name_y = data['name_y']              # e.g. "QBER" or "Sifted Key"
+    start = float(data['start_value_x']) # start value of x param (zenith)
+    end = float(data['end_value_x'])     # end value of x param
+    point = int(data['point'])           # number of sampling points
+
+    # Step size for x-axis
+    step = (end - start) / point
+
+    xs = [end if i == point else start + step * i for i in range(point + 1)]
+    if name_x == "Zenith":
+        x_label = "Zenith (degree)"
+        x_key = "zenith"
+    elif name_x == "Tau zen":
+        x_label = "Transmission Efficiency"
+        x_key = "tau"
+    else:
+        x_label = name_x  # fallback nếu không khớp
+        x_key = None
+
+    # method: 'quad' (mặc định) tích phân quad từng điểm, 'grid' dùng formular.sweep (nhanh hơn nhiều,
+    # lệch quad dưới 1e-6 tương đối với zenith <= 70 độ; gần chân trời quad tự báo mất chính xác)
+    method = data.get('method', 'quad')
+    if method not in ('quad', 'grid'):
+        raise ValueError(f"Unknown integration method: {method}")
+    if method == 'quad':
+        # Chia các điểm cho pool process
+        points = [{**params, x_key: x} if x_key else dict(params) for x in xs]
+        values = sweep_executor.run_sweep(formular.simulation_point, points, seed=data.get('seed'),
+                                          progress=progress)
+        result = {'qber': np.array([v[0] for v in values]), 'skr': np.array([v[1] for v in values])}
+    elif x_key:
+        result = formular.sweep(params, **{x_key: xs})
+    else:
+        result = formular.sweep(params, zenith=[params["zenith"]] * len(xs))
+
+    # Đổi đơn vị để hiển thị
+    qber_values = (result['qber'] * 100).tolist()       # % QBER
+    sifted_key_values = (result['skr'] / 1e6).tolist()  # Kbps
+
+    # Chọn dữ liệu y phù hợp để hiển thị
+    if name_y == "QBER":
+        y = qber_values
+        y_label = "QBER (%)"
+    else:
+        y = sifted_key_values
+        y_label = "Key Generation Rate (Mbps)"
+
+    # Vẽ biểu đồ
+    fig, ax = plt.subplots()
+
+    # Vẽ đường và các điểm
+    ax.plot(xs, y, marker='o', markersize=5, linestyle='--', color='blue')
+
+
+    # Gán nhãn trục
+    ax.set_xlabel(x_label, fontsize=15)
+    ax.set_ylabel(y_label, fontsize=15)  # VD: "Secret Key Rate (Mbps)"
+    ax.set_title("BB84 Simulation")
+    ax.grid(True)
+
+    # Cài đặt giới hạn trục
+    ax.set_xlim(left=min(xs), right=max(xs))
+    if y_label == "Key Generation Rate (Mbps)":
+        ax.set_ylim(0, 0.7)  
+
+    # Căn chỉnh bố cục (dùng fig thay vì plt vì hàm này còn chạy trong thread của job)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    buf.seek(0)
+    plt.close(fig)
+    return buf.getvalue()
 
 
 @app.route('/plot_simulation', methods=['POST'])
 def plot_simulation():
     try:
-        params = {
-            'R': 1e9,
-            's': 0.5,
-            'p': 0.75,
-            'f': 1.0,
-            'd': 0.5,
-            'p_dark': 1e-4,
-            'P_AP': 0.02,
-            'e_0': 0.5,
-            'e_pol': 0.01,
-            'n_s': 0.3,
-            'n_d': 0.09,
-            'zenith': 30,
-            'tau': 0.81
-        }
-
         data = request.get_json()
-        name_x = data['name_x']              # e.g. "Zenith"
-        name_y = data['name_y']              # e.g. "QBER" or "Sifted Key"
-        start = float(data['start_value_x']) # start value of x param (zenith)
-        end = float(data['end_value_x'])     # end value of x param
-        point = int(data['point'])           # number of sampling points
-
-        # Step size for x-axis
-        step = (end - start) / point
-
-        xs = []
-        qber_values = []
-        sifted_key_values = []
-
-        for i in range(point + 1):
-            x_val = end if i == point else start + step * i
-            xs.append(x_val)
-            if name_x == "Zenith":
-                x_label = "Zenith (degree)"
-                params["zenith"] = x_val
-            elif name_x == "Tau zen":
-                x_label = "Transmission Efficiency"
-                params["tau"] = x_val
-            else:
-                x_label = name_x  # fallback nếu không khớp
+        return cached_response('plot_simulation', data, lambda: (render_plot_simulation(data), 'image/png'))
 
-            print(params["tau"])
-            # Tính QBER và SKR tại giá trị hiện tại của tham số x
-            qber_val = formular.simulation_QBer(
-                params
-            )
-
-            skr_val = formular.simulation_SKR(
- params
-            )
-
-            qber_values.append(qber_val * 100)       # % QBER
-            sifted_key_values.append(skr_val / 1e6) # Kbps
+    except Exception as e:
+        app.logger.error(f"Plot simulation error: {e}")
+        return jsonify({'error': str(e)}), 400
 
-        # Chọn dữ liệu y phù hợp để hiển thị
-        if name_y == "QBER":
-            y = qber_values
-            y_label = "QBER (%)"
-        else:
-            y = sifted_key_values
-            y_label = "Key Generation Rate (Mbps)"
 
-        # Vẽ biểu đồ
-        fig, ax = plt.subplots()
 
-        # Vẽ đường và các điểm
-        ax.plot(xs, y, marker='o', markersize=5, linestyle='--', color='blue')
+@app.route('/sweep_simulation', methods=['POST'])
+def sweep_simulation():
+    # QBER/SKR trên lưới nhiều chiều (vd zenith x tau) để vẽ heatmap ở frontend.
+    # Body: {"params": {...}, "axes": {"zenith": [...], "tau": [...]}}
+    # 'axes' trong response là danh sách theo đúng thứ tự chiều của mảng qber/skr.
+    try:
+        data = request.get_json()
+        params = {
+            'R': 1e9, 's': 0.5, 'p': 0.75, 'f': 1.0, 'd': 0.5,
+            'p_dark': 1e-4, 'P_AP': 0.02, 'e_0': 0.5, 'e_pol': 0.01,
+            'n_s': 0.3, 'n_d': 0.09, 'zenith': 30, 'tau': 0.81
+        }
+        params.update({k: float(v) for k, v in data.get('params', {}).items() if k in params})
+        axes = {k: [float(x) for x in v] for k, v in data['axes'].items()}
 
+        import formular
+        result = formular.sweep(params, **axes)
+        return jsonify({
+            'axes': [{'name': k, 'values': v.tolist()} for k, v in result['axes'].items()],
+            'qber': json_values(result['qber'] * 100),
+            'skr': json_values(result['skr'] / 1e6)
+        })
 
-        # Gán nhãn trục
-        ax.set_xlabel(x_label, fontsize=15)
-        ax.set_ylabel(y_label, fontsize=15)  # VD: "Secret Key Rate (Mbps)"
-        ax.set_title("BB84 Simulation")
-        ax.grid(True)
+    except KeyError as e:
+        return jsonify({'error': f"Missing field in JSON: {e}"}), 400
+    except Exception as e:
+        app.logger.error(f"Sweep simulation error: {e}")
+        return jsonify({'error': str(e)}), 400
 
-        # Cài đặt giới hạn trục
-        ax.set_xlim(left=min(xs), right=max(xs))
-        if y_label == "Key Generation Rate (Mbps)":
-            ax.set_ylim(0, 0.7)  
 
-        # Căn chỉnh bố cục
-        plt.tight_layout()
+@app.route('/finite_key_simulation', methods=['POST'])
+def finite_key_simulation():
+    # SKR khoá hữu hạn theo số xung mỗi lần bay qua (block_sizes) x zenith, một lần gọi.
+    # Body: {"params": {...}, "block_sizes": [...], "zenith": [...]}; skr[i][j] ứng với
+    # block_sizes[i], zenith[j].
+    try:
+        data = request.get_json()
+        params = {
+            'R': 1e9, 's': 0.5, 'p': 0.75, 'f': 1.0, 'd': 0.5,
+            'p_dark': 1e-4, 'P_AP': 0.02, 'e_0': 0.5, 'e_pol': 0.01,
+            'n_s': 0.3, 'n_d': 0.09, 'zenith': 30, 'tau': 0.81
+        }
+        params.update({k: float(v) for k, v in data.get('params', {}).items() if k in params})
+        eps = {k: float(data[k]) for k in ('eps_pe', 'eps_sec', 'eps_cor') if data.get(k) not in [None, '']}
+        block_sizes = [float(x) for x in data['block_sizes']]
+        zenith = [float(x) for x in data['zenith']] if data.get('zenith') is not None else None
 
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plt.close(fig)
-        return send_file(buf, mimetype='image/png')
+        import formular
+        result = formular.simulation_SKR_finite(params, block_sizes, zenith, **eps)
+        return jsonify({
+            'block_sizes': result['block_size'].tolist(),
+            'zenith': result['zenith'].tolist(),
+            'skr': json_values(result['skr'] / 1e6),
+            'key_length': json_values(result['key_length'])
+        })
 
+    except KeyError as e:
+        return jsonify({'error': f"Missing field in JSON: {e}"}), 400
     except Exception as e:
-        app.logger.error(f"Plot simulation error: {e}")
+        app.logger.error(f"Finite key simulation error: {e}")
         return jsonify({'error': str(e)}), 400
 
 
+def run_bb84_job(data, progress):
+    # /bb84 chạy nền theo chunk: bộ nhớ cố định, tiến độ và QBER cập nhật sau mỗi chunk
+    n_bits = int(data.get('bitCount', 100))
+    params = {k: v for k, v in data.items()
+              if k not in ('bitCount', 'isEveMode', 'isNoEveMode', 'engine', 'seed', 'format', 'chunkSize')}
+    summary = {'bit_count': n_bits, 'detections': 0, 'matching_bases_count': 0, 'error_count': 0}
+    for chunk in bb84.bb84_stream(n_bits, setup_parameters(params), eve=data.get('isEveMode', False),
+                                  chunk_size=int(data.get('chunkSize', 1_000_000)), seed=data.get('seed')):
+        summary.update(detections=chunk['detections'], matching_bases_count=chunk['matches'],
+                       error_count=chunk['errors'])
+        progress((chunk['offset'] + chunk['size']) / n_bits, qber=chunk['qber'])
+    matching = summary['matching_bases_count']
+    summary['sifted_key_length'] = matching - summary['error_count']
+    summary['quantum_bit_error_rate'] = summary['error_count'] / matching if matching else 0
+    return summary
+
+
+def run_decoy_job(data, progress):
+    # Monte Carlo decoy-state theo từng xung (mặc định 10^7 xung) để kiểm tra chéo /bb84_simu
+    import decoy_simulation
+    params = simu_params(data)
+    if data.get('p_signal') not in [None, '']:
+        params['p_signal'] = float(data['p_signal'])
+    result = decoy_simulation.simulate_decoy(int(data.get('pulses', 10**7)), params, seed=data.get('seed'),
+                                             progress=progress)
+    return decoy_simulation.cross_check(result, params)
+
+
+# Job store trong bộ nhớ; đặt BB84_JOB_DB=<file> để lưu job vào SQLite
+job_queue = jobs.JobQueue(
+    max_workers=int(os.environ.get('BB84_JOB_WORKERS', 2)),
+    store=jobs.SQLiteJobStore(os.environ['BB84_JOB_DB']) if os.environ.get('BB84_JOB_DB') else None
+)
+JOB_KINDS = {'bb84': run_bb84_job, 'plot_simulation': render_plot_simulation, 'decoy': run_decoy_job}
+
+
+@app.route('/jobs/<kind>', methods=['POST'])
+def submit_job(kind):
+    if kind not in JOB_KINDS:
+        return jsonify({'error': f"Unknown job kind: {kind}"}), 404
+    try:
+        job_id = job_queue.submit(kind, JOB_KINDS[kind], request.get_json())
+    except jobs.JobStoreFull as e:
+        return jsonify({'error': f"Job queue is full: {e}"}), 503
+    return jsonify({'id': job_id, 'status': jobs.QUEUED}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] == jobs.ERROR:
+        return jsonify({'error': job['error']}), 400
+    if job['status'] != jobs.DONE:
+        return jsonify({'status': job['status'], 'progress': job['progress']}), 202
+    if isinstance(job['result'], bytes):
+        return send_file(io.BytesIO(job['result']), mimetype='image/png')
+    return jsonify(job['result'])
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    return Response(job_queue.events(job_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+def warm_up():
+    # Import trước các module nặng và chạy thử mỗi đường tính một lần, để request đầu tiên
+    # không phải chịu thời gian import/khởi tạo. Bật bằng BB84_WARMUP=1.
+    import formular
+    import matplotlib.pyplot
+    formular.simulation_point({'R': 1e9, 's': 0.5, 'p': 0.75, 'f': 1.0, 'd': 0.5, 'p_dark': 1e-4, 'P_AP': 0.02,
+                               'e_0': 0.5, 'e_pol': 0.01, 'n_s': 0.3, 'n_d': 0.09, 'zenith': 30, 'tau': 0.81})
+    bb84.bb84_packed(1000)
+    circuit_svg.render_svg([0, 1], [0, 1], [1, 0])
+
+
+if os.environ.get('BB84_WARMUP'):
+    threading.Thread(target=warm_up, daemon=True).start()
+
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,73 @@
+import atexit
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def get_pool():
+    # Một pool process default_workers() worker dùng chung cho cả tiến trình (Flask hoặc script),
+    # tạo khi cần dưới lock và không bao giờ bị thay, vì các thread request khác có thể đang map
+    # trên nó. Đóng lúc thoát bằng shutdown() (atexit).
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=default_workers())
+        return _pool
+
+
+@atexit.register
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def _run_chunk(func, points, seeds):
+    return [func(point, np.random.default_rng(seed)) for point, seed in zip(points, seeds)]
+
+
+def run_sweep(func, points, seed=None, max_workers=None, chunksize=None, progress=None):
+    # Chạy func(point, rng) cho mọi điểm quét, trả kết quả theo đúng thứ tự points.
+    # Mỗi điểm có luồng RNG riêng sinh từ SeedSequence(seed).spawn theo chỉ số điểm, nên
+    # với cùng seed kết quả không phụ thuộc số worker hay cách chia chunk.
+    # func phải là hàm cấp module để pickle được sang process con.
+    # progress(fraction) (tuỳ chọn) được gọi sau mỗi chunk xong.
+    # max_workers khác default_workers() chạy trên pool riêng, đóng lại khi sweep xong.
+    points = list(points)
+    if not points:
+        return []
+    seeds = np.random.SeedSequence(seed).spawn(len(points))
+    workers = min(max_workers or default_workers(), len(points))
+    if chunksize is None:
+        # ~4 chunk cho mỗi worker để cân tải khi các điểm tốn thời gian khác nhau
+        chunksize = max(1, math.ceil(len(points) / (4 * workers)))
+
+    chunks = [(points[i:i + chunksize], seeds[i:i + chunksize]) for i in range(0, len(points), chunksize)]
+    if workers == 1 or len(chunks) == 1:
+        return _collect((_run_chunk(func, chunk_points, chunk_seeds) for chunk_points, chunk_seeds in chunks),
+                        len(points), progress)
+    if max_workers is None or max_workers == default_workers():
+        return _collect(get_pool().map(_run_chunk, [func] * len(chunks), *zip(*chunks)), len(points), progress)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return _collect(pool.map(_run_chunk, [func] * len(chunks), *zip(*chunks)), len(points), progress)
+
+
+def _collect(results, n_points, progress):
+    done = []
+    for chunk in results:
+        done.extend(chunk)
+        if progress is not None:
+            progress(len(done) / n_points)
+    return done
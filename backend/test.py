@@ -5,6 +5,7 @@ from flask_cors import CORS
 import io
 import numpy as np
 import matplotlib.pyplot as plt
+import sweep_executor
 
 
 params = {
@@ -25,79 +26,82 @@ name_y = "Sifted Key"
 start = 1
 end = 3
 point = 10
+n_bits = 100000
+seed = None  # đặt số nguyên để chạy lại cho kết quả giống hệt
 
 step = (end - start) / point
-Qber = []
-xs = []
-kr = []
-sk = []
-for i in range(point+1):
 
+
+def sweep_value(i):
+    if name_x == 'C2n':
+        return pow(10,-start) + ((pow(10,-end) - pow(10,-start))/point) * i
+    if(i == point):
+        return 3
+    return start + step * i
+
+
+def simulate_point(x, rng):
+    # Một điểm quét, chạy trong process con của sweep_executor
+    point_params = dict(params)
     if name_x == 'C2n':
-        x = pow(10,-start) + ((pow(10,-end) - pow(10,-start))/point) * i
-        xs.append(x)
-        params["C2n"] = x
-    else:
-        if(i == point):
-            x=3
-            xs.append(x)
-        else:
-            x = start + step * i
-            xs.append(x)
-        if name_x == 'Detection Efficiency':
-            detector_efficiency = x/100
-            params["detectorEfficiency"] = x/100
-        elif name_x == 'Length':
-            # fiber_length = x
-            params["L"] = x*1000
-            params["qberFraction"] = 1
-        elif name_x == 'Source Efficiency':
-            source_efficiency = x/100
-            params["sourceEfficiency"] = x/100
-        elif name_x == 'Sop Mean Deviation':
-            params["sopDeviation"] = x
-        elif name_x == 'Perturb Probability':
-            params["perturbProb"] = x/100
+        point_params["C2n"] = x
+    elif name_x == 'Detection Efficiency':
+        point_params["detectorEfficiency"] = x/100
+    elif name_x == 'Length':
+        # fiber_length = x
+        point_params["L"] = x*1000
+        point_params["qberFraction"] = 1
+    elif name_x == 'Source Efficiency':
+        point_params["sourceEfficiency"] = x/100
+    elif name_x == 'Sop Mean Deviation':
+        point_params["sopDeviation"] = x
+    elif name_x == 'Perturb Probability':
+        point_params["perturbProb"] = x/100
 
-    print(f"step {i+1} ")
-    n_bits = 100000
     alice_bits, bob_bits, alice_bases, bob_bases, sifted_key, qber, matching_bases_count = Simu.bb84(n_bits,
                                                                                                      True,
                                                                                                      True,
                                                                                                      False,
                                                                                                      False,
-                                                                                                     params)
+                                                                                                     point_params,
+                                                                                                     seed=rng)
     key_rate = len(sifted_key) * (1-qber) * (1-0.8)
-    kr.append(key_rate)
-    Qber.append(qber * 100)
-    sk.append(len(sifted_key)/1000)
-y = Qber
-if name_y == "Sifted Key":
-    y = sk
-    name_y = "Sifted Key (KBit)"
-elif name_y == "QBER":
+    return key_rate, qber * 100, len(sifted_key)/1000
+
+
+if __name__ == "__main__":
+    xs = [sweep_value(i) for i in range(point+1)]
+    results = sweep_executor.run_sweep(simulate_point, xs, seed=seed)
+    kr = [r[0] for r in results]
+    Qber = [r[1] for r in results]
+    sk = [r[2] for r in results]
     y = Qber
-    name_y = "QBER (%)"
-if name_x == "Length": name_x = "FSO Length (km)"
-elif name_x == 'Sop Mean Deviation':
-    name_x = "Sop Mean Deviation (rad)"
-elif name_x == 'Perturb Probability':
-    name_x = "Perturb Probability (%)"
-fig, ax = plt.subplots()
-ax.plot(xs, y, marker='o', linestyle='--', color='blue')
-ax.set_xlabel(name_x)
-ax.set_ylabel(name_y)
-ax.set_title('BB84 Simulation')
-ax.grid(True)
-ax.legend()
+    if name_y == "Sifted Key":
+        y = sk
+        name_y = "Sifted Key (KBit)"
+    elif name_y == "QBER":
+        y = Qber
+        name_y = "QBER (%)"
+    if name_x == "Length": name_x = "FSO Length (km)"
+    elif name_x == 'Sop Mean Deviation':
+        name_x = "Sop Mean Deviation (rad)"
+    elif name_x == 'Perturb Probability':
+        name_x = "Perturb Probability (%)"
+    fig, ax = plt.subplots()
+    ax.plot(xs, y, marker='o', linestyle='--', color='blue')
+    ax.set_xlabel(name_x)
+    ax.set_ylabel(name_y)
+    ax.set_title('BB84 Simulation')
+    ax.grid(True)
+    ax.legend()
 
-# Đặt xticks là 0, 0.5, 1, ..., 3
-ax.set_xticks([i * 0.5 for i in range(7)])  # 0*0.5=0, 1*0.5=0.5, ..., 6*0.5=3
+    # Đặt xticks là 0, 0.5, 1, ..., 3
+    ax.set_xticks([i * 0.5 for i in range(7)])  # 0*0.5=0, 1*0.5=0.5, ..., 6*0.5=3
 
-# Giới hạn trục x từ 1 đến 3
-ax.set_xlim(1, 3)
+    # Giới hạn trục x từ 1 đến 3
+    ax.set_xlim(1, 3)
 
-buf = io.BytesIO()
-plt.savefig(buf, format='png')
-buf.seek(0)
-plt.show()
\ No newline at end of file
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png')
+    buf.seek(0)
+    plt.show()
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module của backend được import theo tên (import formular, import bb84...) như khi chạy server
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
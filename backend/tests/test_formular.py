@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import formular
+from yudai.fso_link_muy_sigma_change import AtmosphericChannel
+
+FORMULA = dict(p_dark=1e-4, P_AP=0.02, e_0=0.5, e_pol=0.01, n_s=0.3, n_d=0.09)
+
+
+@pytest.mark.parametrize('tau', [0.1, 0.5, 0.81])
+@pytest.mark.parametrize('zenith', [75, 85, 88, 89.9, 90])
+def test_grid_quadrature_finite_near_horizon(tau, zenith):
+    channel = AtmosphericChannel(tau_zen=tau, H_source=500e3)
+    eta, weights = formular.pdf_nodes(channel, zenith)
+    assert np.all(np.isfinite(eta)) and np.all(np.isfinite(weights))
+    assert weights.sum() == pytest.approx(1, abs=1e-9)
+    qber, gain = formular.qber_cal(*(FORMULA[k] for k in ('p_dark', 'P_AP', 'e_0', 'e_pol', 'n_s')), channel,
+                                   zenith, method='grid')
+    assert 0 < qber <= FORMULA['e_0'] and gain >= FORMULA['p_dark'] * (1 + FORMULA['P_AP'])
+
+
+def test_decoy_bounds_match_textbook_formulas():
+    p = FORMULA
+    rng = np.random.default_rng(4)
+    Q_mu, Q_nu = rng.uniform(1e-3, 1e-2, 2)
+    EQ = 0.03 * Q_nu
+    Y_0 = p['p_dark'] * (1 + p['P_AP'])
+    mu, nu = p['n_s'], p['n_d']
+    # decoy-state GLLP: cận dưới gain một photon và cận trên tỉ lệ lỗi một photon
+    Q_1_L = mu ** 2 * np.exp(-mu) / (mu * nu - nu ** 2) * (
+        Q_nu * np.exp(nu) - Q_mu * np.exp(mu) * nu ** 2 / mu ** 2 - (mu ** 2 - nu ** 2) / mu ** 2 * Y_0)
+    Y_1_L = Q_1_L * np.exp(mu) / mu
+    e1_U = (EQ * np.exp(nu) - p['e_0'] * Y_0) / (Y_1_L * nu)
+    np.testing.assert_allclose(formular.decoy_bounds(Q_mu, Q_nu, EQ, p['p_dark'], p['P_AP'], p['e_0'], mu, nu),
+                               (Q_1_L, e1_U), rtol=1e-12)
+
+
+def test_finite_key_converges_to_asymptotic_rate():
+    p = FORMULA
+    channel = AtmosphericChannel(tau_zen=0.81, H_source=500e3)
+    args = (1e9, 0.5, 0.75, 0.5, 1.0, p['p_dark'], p['e_0'], p['e_pol'], p['n_s'], p['n_d'], p['P_AP'], channel, 30)
+    asymptotic = formular.compute_SKR(*args, method='grid')
+    finite, _ = formular.compute_SKR_finite(*args, block_size=1e20)
+    assert finite == pytest.approx(asymptotic, rel=1e-3)
+    smaller, _ = formular.compute_SKR_finite(*args, block_size=1e11)
+    assert smaller < finite
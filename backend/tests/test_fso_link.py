@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+import formular
+from yudai.fso_link_muy_sigma_change import AtmosphericChannel
+
+
+@pytest.mark.parametrize('zenith', [30, 60, 85, 89.9, 90])
+def test_sample_finite_near_horizon(zenith):
+    channel = AtmosphericChannel(tau_zen=0.5, H_source=500e3)
+    assert np.all(np.isfinite(channel.sample(zenith, 1000, 1)))
+
+
+@pytest.mark.parametrize('zenith', [30, 60, 85])
+def test_sample_matches_grid_quadrature(zenith):
+    # So trên xác suất phát hiện 1 - exp(-n_s eta) (bị chặn) thay vì eta: gần chân trời
+    # đuôi trên của eta nặng đến mức trung bình mẫu của eta không ổn định
+    channel = AtmosphericChannel(tau_zen=0.81, H_source=500e3)
+    eta, weights = formular.pdf_nodes(channel, zenith)
+    expected = np.sum(-np.expm1(-0.3 * eta) * weights)
+    detected = -np.expm1(-0.3 * channel.sample(zenith, 200_000, 1))
+    assert abs(detected.mean() - expected) < 5 * detected.std() / np.sqrt(len(detected))
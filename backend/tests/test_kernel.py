@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import bb84_core as core
+from bb84_core import kernel
+
+
+def test_prob_zero_matches_statevector():
+    qiskit = pytest.importorskip('qiskit')
+    from qiskit.quantum_info import Statevector
+    rng = np.random.default_rng(3)
+    n, depth = 40, 6
+    gates = rng.choice([kernel.GATE_I, kernel.GATE_X, kernel.GATE_H, kernel.GATE_RY],
+                       (n, depth)).astype(np.int8)
+    angles = rng.uniform(0, 2 * np.pi, (n, depth))
+    seq = kernel.GateSequence(n)
+    for k in range(depth):
+        # mỗi qubit chỉ có một cổng ở bước k nên thứ tự các lần append không quan trọng
+        for gate in (kernel.GATE_X, kernel.GATE_H, kernel.GATE_RY):
+            seq.append(gate, gates[:, k] == gate, angles[:, k])
+
+    expected = []
+    for i in range(n):
+        qc = qiskit.QuantumCircuit(1)
+        for gate, theta in zip(gates[i], angles[i]):
+            if gate == kernel.GATE_X:
+                qc.x(0)
+            elif gate == kernel.GATE_H:
+                qc.h(0)
+            elif gate == kernel.GATE_RY:
+                qc.ry(theta, 0)
+        expected.append(Statevector(qc).probabilities()[0])
+    np.testing.assert_allclose(kernel.prob_zero(seq), expected, atol=1e-12)
+
+
+def test_numpy_backend_matches_statevector_backend():
+    pytest.importorskip('qiskit')
+    # NumpyBackend (kernel) và StatevectorBackend rút cùng các số ngẫu nhiên nên cùng seed cho cùng kết quả
+    chs = [core.FiberLoss(10, 0.2, 0.9, 0.8), core.Perturbation(0.2), core.SOPDeviation(0.3)]
+    runs = [core.simulate(500, chs, core.InterceptResend(0.5, chs), backend=backend, rng=7)
+            for backend in ('numpy', 'statevector')]
+    for a, b in zip(*runs):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,43 @@
+import pytest
+
+import bb84
+from packed_result import PackedResult
+
+PARAMS = {'fiberLength': 10}
+FIELDS = ('alice_bits', 'bob_bits', 'alice_bases', 'bob_bases', 'eve_bits', 'eve_bases')
+
+
+@pytest.fixture(scope='module')
+def packed_run():
+    n = 1003
+    return bb84.bb84_packed(n, PARAMS, eve=True, seed=5), bb84.bb84_Eve(n, PARAMS, seed=5)
+
+
+@pytest.mark.parametrize('index', [slice(None), slice(0, 8), slice(3, 1000), slice(8, 17), slice(5, 5),
+                                   slice(997, 1003), slice(1, 900, 7)])
+def test_packed_slice_matches_list_path(packed_run, index):
+    packed, lists = packed_run
+    full = dict(zip(FIELDS, lists[:6]))
+    part = packed[index].as_lists()
+    for name in FIELDS:
+        assert part[name] == full[name][index], name
+    expected_key = [str(a) for a, b, x, y in zip(full['alice_bits'][index], full['bob_bits'][index],
+                                                  full['alice_bases'][index], full['bob_bases'][index])
+                    if b is not None and x == y and a == b]
+    assert part['sifted_key'] == expected_key
+
+
+def test_packed_matches_list_counters(packed_run):
+    packed, lists = packed_run
+    assert packed.qber == pytest.approx(lists[7])
+    assert packed.matching_count == lists[8]
+
+
+@pytest.mark.parametrize('index', [slice(None), slice(3, 1000)])
+def test_packed_serialization_round_trip(packed_run, index):
+    packed = packed_run[0][index]
+    for restored in (PackedResult.from_bytes(packed.to_bytes()), PackedResult.from_dict(packed.to_dict())):
+        assert restored.n == packed.n
+        assert restored.as_lists() == packed.as_lists()
+    with pytest.raises(ValueError):
+        PackedResult.from_bytes(packed.to_bytes()[:-1])
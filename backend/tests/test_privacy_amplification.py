@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+from privacy_amplification import toeplitz_hash
+
+
+@pytest.mark.parametrize('n, m', [(1, 1), (7, 3), (16, 16), (33, 5), (64, 40)])
+def test_toeplitz_hash_matches_dense_product(n, m):
+    rng = np.random.default_rng(n * 100 + m)
+    blocks = rng.integers(0, 2, (3, n), dtype=np.uint8)
+    seeds = rng.integers(0, 2, (3, n + m - 1), dtype=np.uint8)
+    i, j = np.indices((m, n))
+    for block, seed, hashed in zip(blocks, seeds, toeplitz_hash(blocks, m, seeds)):
+        T = seed[i - j + n - 1].astype(np.int64)
+        np.testing.assert_array_equal(hashed, T @ block % 2)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+import formular
+import reconciliation
+
+
+@pytest.mark.parametrize('n, qber', [(1000, 0.01), (100_000, 0.03), (100_000, 0.08), (257, 0.2)])
+def test_cascade_corrects_every_error(n, qber):
+    rng = np.random.default_rng(n)
+    alice = rng.integers(0, 2, n, dtype=np.uint8)
+    bob = alice ^ (rng.random(n) < qber).astype(np.uint8)
+    result = reconciliation.cascade(alice, bob, rng=1)
+    assert result['initial_errors'] > 0
+    assert result['residual_errors'] == 0
+    np.testing.assert_array_equal(result['key'], alice)
+    assert result['leaked_bits'] >= n * formular.H_2(result['initial_errors'] / n)
+
+
+def test_cascade_error_free_key():
+    key = np.random.default_rng(1).integers(0, 2, 1000, dtype=np.uint8)
+    result = reconciliation.cascade(key, key, rng=1)
+    assert result['residual_errors'] == 0
+    assert result['efficiency'] is None
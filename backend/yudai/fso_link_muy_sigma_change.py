@@ -1,7 +1,8 @@
+import threading
+from collections import OrderedDict
 import numpy as np
 from scipy.integrate import quad
-from scipy.special import erf, erfc
-import matplotlib.pyplot as plt
+from scipy.special import erf, erfc, log_ndtr
 
 
 class AtmosphericChannel:
@@ -21,7 +22,12 @@ class AtmosphericChannel:
 
     def sec(self, zenith):
         return 1 / np.cos(np.radians(zenith))
-    
+
+    def cache_key(self):
+        # Các tham số vật lý quyết định kết quả của prepare_parameters (trừ zenith)
+        return (self.lamda_nm, self.a, self.tau_zen, self.theta, self.H_ogs,
+                self.H_atm, self.v, self.A, self.H_source)
+
     def print_parameters(self):
         print("=== Channel Parameters ===")
         print(f"Lambda (nm): {self.lamda_nm}")
@@ -50,10 +56,26 @@ class AtmosphericChannel:
         p3 = self.A * np.exp(-h / 100)
         return p1 + p2 + p3
 
+    def height_integrals(self):
+        # Hai tích phân theo độ cao (H_ogs -> H_atm) không phụ thuộc zenith nên chỉ
+        # tính một lần cho mỗi bộ (v, A, H_ogs, H_atm); zenith chỉ vào qua sec và L.
+        key = (self.v, self.A, self.H_ogs, self.H_atm)
+        if getattr(self, '_height_integrals_key', None) != key:
+            def integrand_r2(h):
+                return self.Cn2_HV(h) * ((h - self.H_ogs)**(5/6))
+
+            def integrand_eq11(h):
+                return self.Cn2_HV(h) * ((h - self.H_ogs) / (self.H_atm - self.H_ogs))**(5/3)
+
+            I, _ = quad(integrand_r2, self.H_ogs, self.H_atm)
+            T2, _ = quad(integrand_eq11, self.H_ogs, self.H_atm)
+            self._height_integrals = (I, T2)
+            self._height_integrals_key = key
+        return self._height_integrals
+
+    # sigma_r2, beam_sizes và prepare_parameters nhận zenith là số hoặc mảng numpy
     def sigma_r2(self, zenith):
-        def integrand(h):
-            return self.Cn2_HV(h) * ((h - self.H_ogs)**(5/6))
-        I, _ = quad(integrand, self.H_ogs, self.H_atm)
+        I, _ = self.height_integrals()
         part1 = 2.25 * (2 * np.pi / self.lamda_m)**(7/6)
         sec_zen = self.sec(zenith)
         part2 = sec_zen**(11/6)
@@ -69,22 +91,28 @@ class AtmosphericChannel:
 
         T1 = 4.35 * ((2 * L_m) / (k * w**2))**(5/6) * k**(7/6) * ((self.H_atm - self.H_ogs)**(5/6)) * (sec_zen**(11/6))
 
-        def integrand_eq11(h):
-            return self.Cn2_HV(h) * ((h - self.H_ogs) / (self.H_atm - self.H_ogs))**(5/3)
-
-        T2, _ = quad(integrand_eq11, self.H_ogs, self.H_atm)
+        _, T2 = self.height_integrals()
         T = T1 * T2
         wL = w * np.sqrt(1 + T)
         return w0, w, wL
 
     def prepare_parameters(self, zenith):
+        phi_mod, log_A_mod, log_eta_l, mu, sigma_R = self.prepare_log_parameters(zenith)
+        return phi_mod, np.exp(log_A_mod), np.exp(log_eta_l), mu, sigma_R
 
+    def pointing_errors(self, zenith):
+        # Sai số định hướng tại zenith, gán lên kênh (print_parameters đọc các thuộc tính này)
         new_H_source = self.compute_L_km(zenith)
         self.muy_x =  0
         self.muy_y =  0
         self.sigma_x =  (self.theta / 5) * new_H_source * 1000
         self.sigma_y =  (self.theta / 5) * new_H_source * 1000
 
+    def prepare_log_parameters(self, zenith):
+        # Như prepare_parameters nhưng trả về ln(A_mod) và ln(eta_l): gần đường chân trời
+        # (zenith > ~89 độ) A_mod = A_0 * exp(arg_pos) tràn số còn eta_l về 0, logarit thì không.
+        self.pointing_errors(zenith)
+
         k = 2 * np.pi / self.lamda_m
         sigma_r_22 = self.sigma_r2(zenith)
         w0, w, wL = self.beam_sizes(zenith)
@@ -108,14 +136,13 @@ class AtmosphericChannel:
             - self.muy_y**2 / (2 * self.sigma_y**2 * phi_y**2)
         )
 
-        G = np.exp(arg_pos)
-        A_mod = A_0 * G
+        log_A_mod = np.log(A_0) + arg_pos
 
         mu = (sigma_r_22 / 2) * (1 + 2 * phi_mod**2)
         sigma_R = np.sqrt(sigma_r_22)
-        eta_l = self.tau_zen**(self.sec(zenith))
+        log_eta_l = self.sec(zenith) * np.log(self.tau_zen)
 
-        return phi_mod, A_mod, eta_l, mu, sigma_R
+        return phi_mod, log_A_mod, log_eta_l, mu, sigma_R
 
     def f_eta(self, eta, phi_mod, A_mod, eta_l, mu, sigma_R):
 
@@ -135,29 +162,114 @@ class AtmosphericChannel:
 
         return result
 
-    def sample(self, zenith=None, n_samples=1):
+    def f_v(self, v, phi_mod, mu, sigma_R):
+        # Mật độ của v = ln(eta / (A_mod * eta_l)), tức eta * f_eta(eta), viết hẳn theo v:
+        # phi^2 / 2 * exp(phi^2 v) * erfc((v + mu) / (sqrt(2) sigma_R)) * exp_part. Không phụ
+        # thuộc A_mod * eta_l và được tính trong miền log (erfc qua log_ndtr) nên không tràn số.
+        power = phi_mod ** 2
+        log_density = (power * v + log_ndtr(-(v + mu) / sigma_R)
+                       + (sigma_R ** 2 / 2) * power * (1 + power))
+        return power * np.exp(log_density)
+
+    def sample(self, zenith=None, n_samples=1, rng=None):
+        # Lấy mẫu eta theo phương pháp CDF ngược: bảng CDF của mật độ fading được tính một
+        # lần cho mỗi (kênh, zenith) rồi mọi lần gọi chỉ cần np.interp trên số ngẫu nhiên đều.
         if zenith is None:
             zenith = 30
 
-        phi_mod, A_mod, eta_l, mu, sigma_R = self.prepare_parameters(zenith)
+        cdf, v, log_scale = fading_table_cache.prepare(self, zenith)
+        u = (rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)).random(n_samples)
+        samples = np.exp(np.interp(u, cdf, v) + log_scale)
+        return samples if n_samples > 1 else samples[0]
+
+
+# Với v = ln(eta / (A_mod * eta_l)), eta * f_eta là mật độ theo v: trơn, giảm theo hàm mũ ở
+# hai phía, gần như toàn bộ khối lượng nằm trong [v_lo, v_hi] dưới đây (phần đuôi bỏ đi
+# nhỏ hơn exp(tail_log)). Dùng chung cho lưới tích phân của formular và bảng lấy mẫu.
+# Có log_scale = ln(A_mod * eta_l) thì v_lo không xuống dưới eta = ETA_FLOOR: gần đường chân
+# trời đuôi dưới kéo tới v ~ -900 trở xuống, eta về 0 và lưới đều bị trải mỏng trên vùng mà
+# 1 - exp(-n eta) không phân biệt được với 0. Người gọi dồn khối lượng dưới ngưỡng vào nút đầu.
+ETA_FLOOR = 1e-30
+
+
+def fading_log_support(phi_mod, sigma_R, tail_sigma=9, tail_log=np.log(1e-16), log_scale=None):
+    v_hi = -sigma_R ** 2 / 2 + tail_sigma * sigma_R
+    v_lo = -sigma_R ** 2 / 2 - tail_sigma * sigma_R + tail_log / phi_mod ** 2
+    if log_scale is not None:
+        v_lo = np.minimum(np.maximum(v_lo, np.log(ETA_FLOOR) - log_scale), v_hi)
+    return v_lo, v_hi
+
+
+FADING_TABLE_NODES = 4096
+
+
+def fading_table(channel, zenith, n_nodes=FADING_TABLE_NODES):
+    # Bảng (cdf, v, ln(A_mod * eta_l)) trên toàn bộ miền của phân phối (không phải cửa sổ eta
+    # cố định). Khối lượng dưới ETA_FLOOR nằm ở cdf[0] nên u < cdf[0] cho eta ~ 0.
+    phi_mod, log_A_mod, log_eta_l, mu, sigma_R = log_prepare_cache.prepare(channel, zenith)
+    log_scale = log_A_mod + log_eta_l
+    v_lo, v_hi = fading_log_support(phi_mod, sigma_R, log_scale=log_scale)
+    v = np.linspace(v_lo, v_hi, n_nodes)
+    density = channel.f_v(v, phi_mod, mu, sigma_R)
+    cdf = np.concatenate(([0.0], np.cumsum((density[1:] + density[:-1]) / 2 * np.diff(v))))
+    cdf += max(1 - cdf[-1], 0.0)
+    if not np.all(np.isfinite(cdf)) or cdf[-1] <= 0:
+        raise ValueError(f"Degenerate fading CDF at zenith={zenith}, tau_zen={channel.tau_zen}")
+    return cdf / cdf[-1], v, log_scale
+
+
+class PreparationCache:
+    # LRU cache cho prepare_parameters (hoặc hàm compute(channel, zenith) khác), khoá theo
+    # tham số kênh + zenith. Dùng chung được giữa các thread của Flask.
+    def __init__(self, maxsize=256, compute=None):
+        self.maxsize = maxsize
+        self.compute = compute
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prepare(self, channel, zenith):
+        # zenith vô hướng; mảng zenith thì gọi thẳng channel.prepare_parameters.
+        # Gán muy/sigma lên kênh cả khi trúng cache để kênh ở đúng trạng thái như khi gọi trực tiếp.
+        channel.pointing_errors(zenith)
+        key = channel.cache_key() + (float(zenith),)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Tính ngoài lock để các thread khác không phải chờ tích phân
+        result = self.compute(channel, zenith) if self.compute else channel.prepare_parameters(zenith)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
 
-        # Giới hạn sampling vùng hợp lý hơn
-        eta_min, eta_max = 0.001, 0.1
-        eta_test = np.linspace(eta_min, eta_max, 500)
-        f_test = np.array([self.f_eta(e, phi_mod, A_mod, eta_l, mu, sigma_R) for e in eta_test])
-        f_max = f_test.max()
 
-        samples = []
-        while len(samples) < n_samples:
-            x = np.random.uniform(eta_min, eta_max)
-            y = np.random.uniform(0, f_max)
-            if y < self.f_eta(x, phi_mod, A_mod, eta_l, mu, sigma_R):
-                samples.append(x)
-        return np.array(samples if n_samples > 1 else samples[0])
+prepare_cache = PreparationCache()
+log_prepare_cache = PreparationCache(compute=AtmosphericChannel.prepare_log_parameters)
+fading_table_cache = PreparationCache(maxsize=64, compute=fading_table)
 
 
 # Hàm vẽ mô phỏng phân phối fading
 def plot_fading_distribution(channel, zenith, eta_min=0.001, eta_max=0.1, num_points=500):
+    import matplotlib.pyplot as plt
     phi_mod, A_mod, eta_l, mu, sigma_R = channel.prepare_parameters(zenith)
     eta_values = np.linspace(eta_min, eta_max, num_points)
     pdf_values = [channel.f_eta(eta, phi_mod, A_mod, eta_l, mu, sigma_R) for eta in eta_values]
@@ -175,5 +287,6 @@ def plot_fading_distribution(channel, zenith, eta_min=0.001, eta_max=0.1, num_po
 
 
 # Thử nghiệm
-channel = AtmosphericChannel(H_source=500e3)  # ví dụ vệ tinh ở 500km
-plot_fading_distribution(channel, zenith=30)
+if __name__ == "__main__":
+    channel = AtmosphericChannel(H_source=500e3)  # ví dụ vệ tinh ở 500km
+    plot_fading_distribution(channel, zenith=30)